@@ -0,0 +1,273 @@
+"""Coste por llamada de `contract` frente a la función sin decorar.
+
+Ejecutar: `python benchmark.py`
+"""
+import asyncio
+import copy
+import inspect
+import time
+import timeit
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+from contracts import contract, deep, invariant, InvariantError, enable_metrics, set_enforcement, get_enforcement, LEVELS, PreconditionError, PostconditionError
+
+def _legacy_contract(require: Optional[Callable] = None, ensure: Optional[Callable] = None):
+  "Implementación anterior: obtiene las signaturas y hace `bind_partial` en cada llamada"
+  def decorator(func: Callable) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      if require is not None:
+        bound_args = inspect.signature(require).bind_partial(*args, **kwargs)
+        bound_args.apply_defaults()
+        if not require(*bound_args.args, **bound_args.kwargs):
+          raise PreconditionError("Falló la verificación de precondición")
+      result = func(*args, **kwargs)
+      if ensure is not None:
+        ensure_sig = inspect.signature(ensure)
+        if len(ensure_sig.parameters) == 1:
+          ok = ensure(result)
+        else:
+          bound_args = ensure_sig.bind_partial(result, *args, **kwargs)
+          bound_args.apply_defaults()
+          ok = ensure(*bound_args.args, **bound_args.kwargs)
+        if not ok:
+          raise PostconditionError("Falló la verificación de postcondición")
+      return result
+    return wrapper
+  return decorator
+
+def _multiply(x: float, y: float = 1.0) -> float:
+  return x * y
+
+_require = lambda x, y=1.0: x > 0 and y > 0
+_ensure = lambda result: result > 0
+
+def _inline(x: float, y: float = 1.0) -> float:
+  "Las mismas comprobaciones escritas a mano: el mínimo alcanzable"
+  if not _require(x, y):
+    raise PreconditionError("Falló la verificación de precondición")
+  result = _multiply(x, y)
+  if not _ensure(result):
+    raise PostconditionError("Falló la verificación de postcondición")
+  return result
+
+VARIANTS: Dict[str, Callable] = {
+  'sin contrato':        _multiply,
+  'predicados en línea': _inline,
+  'contract':            contract(require=_require, ensure=_ensure)(_multiply),
+  'contract anterior':   _legacy_contract(require=_require, ensure=_ensure)(_multiply),
+}
+
+def per_call(func: Callable, number: int = 100_000, repeat: int = 5) -> float:
+  "Mejor tiempo por llamada en nanosegundos"
+  timer = timeit.Timer(lambda: func(3.0, 4.0))
+  return min(timer.repeat(repeat, number)) / number * 1e9
+
+def levels(number: int = 100_000) -> Dict[str, float]:
+  """Coste por llamada del mismo wrapper en cada nivel de aplicación, con métricas y,
+  para `'off'`, también el de decorar con el nivel ya desactivado (se devuelve la función original).
+  """
+  previous = get_enforcement()
+  wrapper = VARIANTS['contract']
+  try:
+    times = {}
+    for level in LEVELS:
+      set_enforcement(level, 100)
+      times[level] = per_call(wrapper, number)
+    set_enforcement('off')
+    times['off al decorar'] = per_call(contract(require=_require, ensure=_ensure)(_multiply), number)
+    set_enforcement('full')
+    enable_metrics()
+    times['full con métricas'] = per_call(wrapper, number)
+  finally:
+    enable_metrics(False)
+    set_enforcement(*previous)
+  return times
+
+def batch_vs_calls(n: int = 100_000) -> Dict[str, float]:
+  """Tiempo total (ms) de validar `n` raíces con una llamada con contrato por valor o con un solo lote.
+
+  Con predicados por elemento el lote solo se ahorra las comprobaciones del envoltorio: cada
+  predicado se sigue llamando una vez por elemento y ese coste domina. Solo un predicado
+  vectorizado (`vectorized=True` con NumPy, si está instalado) elimina el coste por elemento.
+  """
+  values = [float(i) for i in range(n)]
+  root = contract(require=lambda x: x >= 0, ensure=lambda result: result >= 0)(lambda x: x ** 0.5)
+  roots = contract.batch(require=lambda x: x >= 0, ensure=lambda result: result >= 0)(
+    lambda xs: [x ** 0.5 for x in xs])
+  timer = lambda func: min(timeit.repeat(func, number=1, repeat=3)) * 1e3
+  times = {
+    'una llamada por valor': timer(lambda: [root(x) for x in values]),
+    'contract.batch':        timer(lambda: roots(values)),
+  }
+  if np is not None:
+    array = np.array(values)
+    np_roots = contract.batch(require=lambda xs: xs >= 0, ensure=lambda result: result >= 0, vectorized=True)(np.sqrt)
+    times['batch vectorizado'] = timer(lambda: np_roots(array))
+  return times
+
+def _deepcopy_old(ensure: Callable):
+  "Instantánea sin declarar qué se necesita: copia en profundidad de todos los argumentos"
+  def decorator(func: Callable) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      old = copy.deepcopy((args, kwargs))
+      result = func(*args, **kwargs)
+      if not ensure(result, *args, old=old, **kwargs):
+        raise PostconditionError("Falló la verificación de postcondición")
+      return result
+    return wrapper
+  return decorator
+
+def _set_last(items: list, value: float) -> None:
+  items[-1] = value
+
+def old_snapshots(size: int = 1000, number: int = 2_000) -> Dict[str, float]:
+  "Coste por llamada (ns) de una postcondición que compara con el estado previo de una lista de `size` elementos"
+  same_size = lambda result, items=None, value=None, *, old: len(items) == old.size
+  variants = {
+    'sin old':           contract(ensure=lambda result, items=None, value=None: len(items) > 0)(_set_last),
+    'len(items)':        contract(ensure=same_size, old={'size': lambda items: len(items)})(_set_last),
+    'copia superficial': contract(ensure=lambda result, items=None, value=None, *, old: len(items) == len(old.items),
+                                  old={'items': 'items'})(_set_last),
+    'deep(items)':       contract(ensure=lambda result, items=None, value=None, *, old: len(items) == len(old.items),
+                                  old={'items': deep('items')})(_set_last),
+    'deepcopy de todo':  _deepcopy_old(lambda result, items, value, *, old: len(items) == len(old[0][0]))(_set_last),
+  }
+  items = [float(i) for i in range(size)]
+  return {name: min(timeit.repeat(lambda: func(items, 1.0), number=number, repeat=5)) / number * 1e9
+          for name, func in variants.items()}
+
+def _naive_invariant(*predicates: Callable):
+  "Invariantes sin seguimiento de dependencias: todos se evalúan tras cada método público"
+  def decorator(cls: type) -> type:
+    def wrap(method: Callable) -> Callable:
+      @wraps(method)
+      def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        for predicate in predicates:
+          if not predicate(self):
+            raise InvariantError(f"Falló la verificación del invariante {predicate.__name__}")
+        return result
+      return wrapper
+    for name, attr in list(vars(cls).items()):
+      if inspect.isfunction(attr) and not name.startswith('_'):
+        setattr(cls, name, wrap(attr))
+    return cls
+  return decorator
+
+_INVARIANTS = (
+  lambda self: self.balance >= 0,
+  lambda self: self.limit > 0,
+  lambda self: 0 <= self.rate <= 1,
+  lambda self: isinstance(self.owner, str) and len(self.owner) > 0,
+  lambda self: self.opened <= self.updated,
+  lambda self: self.balance <= self.limit * 1000,
+)
+
+class _Account:
+  def __init__(self) -> None:
+    self.balance, self.limit, self.rate = 0, 10, 0.5
+    self.owner, self.opened, self.updated = "ana", 0, 0
+    self.visits = 0
+
+  def touch(self) -> None:
+    "Solo escribe un atributo del que no depende ningún invariante"
+    self.visits += 1
+
+_LEDGER_INVARIANTS = (
+  lambda self: sum(self.history) == self.balance,
+  lambda self: all(-self.limit <= amount <= self.limit for amount in self.history),
+  lambda self: len(self.history) <= self.capacity,
+)
+
+class _Ledger:
+  def __init__(self, size: int = 200) -> None:
+    self.history = tuple((-1) ** i * (i % 10) for i in range(size))
+    self.balance, self.limit, self.capacity = sum(self.history), 10, 10 * size
+    self.visits = 0
+
+  def touch(self) -> None:
+    "Solo escribe un atributo del que no depende ningún invariante"
+    self.visits += 1
+
+def _invariant_variants(base: type, predicates: tuple, number: int) -> Dict[str, float]:
+  variants = {
+    'sin invariantes':  base,
+    'todos cada vez':   _naive_invariant(*predicates)(type('Naive', (base,), {'touch': base.touch})),
+    'con dependencias': invariant(*predicates)(type('Tracked', (base,), {'touch': base.touch})),
+  }
+  times = {}
+  for name, cls in variants.items():
+    obj = cls()
+    times[name] = min(timeit.repeat(obj.touch, number=number, repeat=5)) / number * 1e9
+  return times
+
+def invariants(number: int = 100_000) -> Dict[str, float]:
+  """Coste por llamada (ns) de un método con 6 invariantes triviales: sin invariantes, reevaluando todos o con dependencias.
+  Con invariantes tan baratos el seguimiento cuesta casi lo mismo que reevaluarlos; la
+  diferencia aparece cuando son caros (`ledger_invariants`).
+  """
+  return _invariant_variants(_Account, _INVARIANTS, number)
+
+def ledger_invariants(number: int = 20_000) -> Dict[str, float]:
+  "Como `invariants` con 3 invariantes que recorren un historial de 200 movimientos"
+  return _invariant_variants(_Ledger, _LEDGER_INVARIANTS, number)
+
+async def _fetch(x: float) -> float:
+  "Corrutina que cede el control una vez, como una E/S mínima"
+  await asyncio.sleep(0)
+  return x
+
+async def _positive(x: float) -> bool:
+  return x > 0
+
+ASYNC_VARIANTS: Dict[str, Callable] = {
+  'sin contrato':        _fetch,
+  'contract':            contract(require=lambda x: x > 0, ensure=lambda result: result > 0)(_fetch),
+  'predicado asíncrono': contract(require=_positive, ensure=lambda result: result > 0)(_fetch),
+}
+
+def async_gather(concurrency: int = 1000, rounds: int = 20) -> Dict[str, float]:
+  "Latencia media por llamada (ns) lanzando `concurrency` llamadas a la vez con `asyncio.gather`"
+  async def run(func: Callable) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+      start = time.perf_counter_ns()
+      await asyncio.gather(*(func(float(i + 1)) for i in range(concurrency)))
+      best = min(best, (time.perf_counter_ns() - start) / concurrency)
+    return best
+  return {name: asyncio.run(run(func)) for name, func in ASYNC_VARIANTS.items()}
+
+
+if __name__ == "__main__":
+  times = {name: per_call(func) for name, func in VARIANTS.items()}
+  base = times['sin contrato']
+  for name, elapsed in times.items():
+    print(f"{name:>20}: {elapsed:8.1f} ns/llamada ({elapsed - base:+8.1f} ns)")
+  print("== niveles ==")
+  for name, elapsed in levels().items():
+    print(f"{name:>20}: {elapsed:8.1f} ns/llamada ({elapsed - base:+8.1f} ns)")
+  print("== lote de 100000 valores ==")
+  for name, elapsed in batch_vs_calls().items():
+    print(f"{name:>22}: {elapsed:8.1f} ms")
+  print("== invariantes (6 invariantes, el método solo escribe `visits`) ==")
+  for name, elapsed in invariants().items():
+    print(f"{name:>20}: {elapsed:8.1f} ns/llamada")
+  print("== invariantes sobre un historial de 200 movimientos ==")
+  for name, elapsed in ledger_invariants().items():
+    print(f"{name:>20}: {elapsed:8.1f} ns/llamada")
+  print("== instantáneas old (lista de 1000 elementos) ==")
+  for name, elapsed in old_snapshots().items():
+    print(f"{name:>20}: {elapsed:10.1f} ns/llamada")
+  print("== asyncio.gather (1000 llamadas concurrentes) ==")
+  times = async_gather()
+  base = times['sin contrato']
+  for name, elapsed in times.items():
+    print(f"{name:>20}: {elapsed:8.1f} ns/llamada ({elapsed - base:+8.1f} ns)")
@@ -1,6 +1,14 @@
+import copy
 import inspect
+import os
+import time
+import types
+import weakref
+from collections import namedtuple
 from functools import wraps
-from typing import Callable, Any, Optional
+from itertools import compress, count
+from operator import attrgetter, not_
+from typing import Callable, Any, Dict, Iterable, List, Optional, Tuple
 
 class ContractError(Exception):
   "Excepción base para errores de contrato"
@@ -14,6 +22,21 @@ class PostconditionError(ContractError):
 class ContractSignatureError(ContractError):
   "Excepción lanzada cuando la signatura del contrato es inválida"
 
+class InvariantError(ContractError):
+  "Excepción lanzada cuando falla un invariante de clase"
+
+class BatchPreconditionError(PreconditionError):
+  "Excepción lanzada cuando elementos de un lote incumplen la precondición; `indices` indica cuáles"
+  def __init__(self, message: str, indices: List[int]) -> None:
+    super().__init__(message)
+    self.indices = indices
+
+class BatchPostconditionError(PostconditionError):
+  "Excepción lanzada cuando resultados de un lote incumplen la postcondición; `indices` indica cuáles"
+  def __init__(self, message: str, indices: List[int]) -> None:
+    super().__init__(message)
+    self.indices = indices
+
 #region: Validación de signaturas
 def _validate_require_signature(require_func: Callable, decorated_func: Callable) -> None:
   """Valida que la signatura de la función de precondición sea compatible con la función decorada.
@@ -75,12 +98,15 @@ def _validate_require_signature(require_func: Callable, decorated_func: Callable
       f"con la función decorada: {str(e)}"
     )
 
-def _validate_ensure_signature(ensure_func: Callable) -> None:
+def _validate_ensure_signature(ensure_func: Callable, old: bool = False) -> None:
   """Valida que la signatura de la función de postcondición sea válida. 
   Solo debe tener un parámetro posicional requerido (result) y parámetros opcionales o keyword-only con valores por defecto.
+  Con `old` debe tener además un parámetro `old`, que recibe las instantáneas previas a la llamada;
+  se pasa por nombre, así que debe ser keyword-only o ir detrás de los posicionales.
   
   Args:
       ensure_func (Callable): _description_
+      old (bool, optional): El contrato declara instantáneas `old`. Defaults to False.
 
   Raises:
       ContractSignatureError: _description_
@@ -89,6 +115,23 @@ def _validate_ensure_signature(ensure_func: Callable) -> None:
   ensure_sig = inspect.signature(ensure_func)
   params = list(ensure_sig.parameters.values())
   
+  if old:
+    if 'old' not in ensure_sig.parameters or ensure_sig.parameters['old'].kind not in (
+        inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY):
+      raise ContractSignatureError(
+        "La función de postcondición debe tener un parámetro 'old' para recibir las instantáneas"
+      )
+    # los posicionales se rellenan en orden y `old` se pasa por nombre: si hubiera
+    # posicionales detrás, el primero de ellos ocuparía el hueco de `old`
+    after = params[[p.name for p in params].index('old') + 1:]
+    if ensure_sig.parameters['old'].kind != inspect.Parameter.KEYWORD_ONLY and any(
+        p.kind in (*_POSITIONAL, inspect.Parameter.VAR_POSITIONAL) for p in after):
+      raise ContractSignatureError(
+        "El parámetro 'old' de la función de postcondición debe ser keyword-only "
+        "o ir después de todos los parámetros posicionales"
+      )
+    params = [p for p in params if p.name != 'old']
+  
   # Contar parámetros requeridos
   required_positional = 0
   required_keyword_only = 0
@@ -117,6 +160,425 @@ def _validate_ensure_signature(ensure_func: Callable) -> None:
     )
 #endregion
 
+#region: Niveles de aplicación
+LEVELS = ('off', 'pre', 'sampled', 'full')
+_level = 'full'
+_sample_rate = 100
+# wrappers generados, para regenerarlos cuando cambia el nivel
+_COMPILED: "weakref.WeakSet[Callable]" = weakref.WeakSet()
+
+def set_enforcement(level: str, sample_rate: Optional[int] = None) -> None:
+  """Cambia qué comprueban los contratos.
+  
+  - `'off'`: nada. Las funciones decoradas a partir de ahora se devuelven sin envolver
+    (coste cero) y las ya decoradas reenvían la llamada directamente.
+  - `'pre'`: solo las precondiciones.
+  - `'sampled'`: pre y postcondiciones en una de cada `sample_rate` llamadas (con un contador, sin azar).
+  - `'full'`: todas las comprobaciones (por defecto).
+  
+  Los wrappers existentes se regeneran, así que el nivel no se consulta en cada llamada.
+  El nivel inicial se lee de las variables de entorno `CONTRACTS_LEVEL` y `CONTRACTS_SAMPLE_RATE`.
+  """
+  global _level, _sample_rate
+  if level not in LEVELS:
+    raise ValueError(f"Nivel de contratos desconocido '{level}'. Disponibles: {', '.join(LEVELS)}")
+  if sample_rate is not None:
+    if sample_rate < 1:
+      raise ValueError("La tasa de muestreo debe ser un entero positivo")
+    _sample_rate = sample_rate
+  _level = level
+  _recompile_all()
+
+def get_enforcement() -> Tuple[str, int]:
+  "Nivel actual y tasa de muestreo"
+  return _level, _sample_rate
+
+def _recompile_all() -> None:
+  for wrapper in list(_COMPILED):
+    wrapper.__contract__.recompile(wrapper)
+#endregion
+
+#region: Métricas
+class ContractMetrics:
+  "Contadores de una función con contrato; el tiempo de los predicados en nanosegundos"
+  FIELDS = ('calls', 'checks', 'precondition_failures', 'postcondition_failures', 'predicate_time_ns')
+  __slots__ = FIELDS + ('__weakref__',)
+
+  def __init__(self) -> None:
+    self.reset()
+
+  def reset(self) -> None:
+    self.calls = 0
+    self.checks = 0
+    self.precondition_failures = 0
+    self.postcondition_failures = 0
+    self.predicate_time_ns = 0
+
+  def as_dict(self) -> Dict[str, int]:
+    return {name: getattr(self, name) for name in self.FIELDS}
+
+_metrics_enabled = False
+# nombre completo de la función -> contadores
+_METRICS: Dict[str, ContractMetrics] = {}
+# contadores de funciones decoradas con las métricas desactivadas -> nombre con el que registrarlos
+_UNREGISTERED: "weakref.WeakKeyDictionary[ContractMetrics, str]" = weakref.WeakKeyDictionary()
+
+def _metric_name(func: Callable) -> str:
+  "`módulo.función`; para objetos sin `__qualname__` (`partial`, instancias invocables) su `repr`"
+  name = getattr(func, '__qualname__', None)
+  if name is None:
+    return repr(func)
+  module = getattr(func, '__module__', None)
+  return f"{module}.{name}" if module else name
+
+def _register(counters: ContractMetrics, name: str) -> None:
+  "Registra los contadores con un nombre único: `nombre`, `nombre#2`, `nombre#3`..."
+  unique, n = name, 1
+  while unique in _METRICS:
+    n += 1
+    unique = f"{name}#{n}"
+  _METRICS[unique] = counters
+
+def _new_metrics(func: Callable) -> ContractMetrics:
+  """Contadores propios de un wrapper. Solo se añaden al registro con las métricas activadas;
+  si no, se registran al activarlas (si el wrapper sigue vivo).
+  """
+  counters = ContractMetrics()
+  if _metrics_enabled:
+    _register(counters, _metric_name(func))
+  else:
+    _UNREGISTERED[counters] = _metric_name(func)
+  return counters
+
+def enable_metrics(enabled: bool = True) -> None:
+  """Activa o desactiva las métricas de los contratos (llamadas, comprobaciones, fallos y
+  tiempo de los predicados con `perf_counter_ns`). Desactivadas, el código generado no
+  incluye ninguna instrucción de medida. También se activan con `CONTRACTS_METRICS=1`.
+  """
+  global _metrics_enabled
+  _metrics_enabled = enabled
+  if enabled:
+    for counters, name in list(_UNREGISTERED.items()):
+      _register(counters, name)
+    _UNREGISTERED.clear()
+  _recompile_all()
+
+def metrics() -> Dict[str, Dict[str, int]]:
+  """Métricas de cada función con contrato, por nombre completo (`módulo.función`).
+  Cada wrapper tiene sus propios contadores: si varios comparten nombre (lambdas, clausuras
+  de una misma fábrica) los siguientes se registran como `nombre#2`, `nombre#3`...
+  """
+  return {name: counters.as_dict() for name, counters in _METRICS.items()}
+
+def reset_metrics() -> None:
+  for counters in _METRICS.values():
+    counters.reset()
+
+def _label(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+_PROMETHEUS = (
+  # métrica, ayuda, contador, conversión del valor
+  ('contract_calls_total', 'Llamadas a funciones con contrato', 'calls', int),
+  ('contract_checks_total', 'Llamadas en las que se evaluaron los predicados', 'checks', int),
+  ('contract_precondition_failures_total', 'Precondiciones incumplidas', 'precondition_failures', int),
+  ('contract_postcondition_failures_total', 'Postcondiciones incumplidas', 'postcondition_failures', int),
+  ('contract_predicate_seconds_total', 'Tiempo acumulado evaluando predicados', 'predicate_time_ns', lambda ns: ns / 1e9),
+)
+
+def metrics_prometheus() -> str:
+  "Métricas en el formato de texto de Prometheus"
+  lines = []
+  for metric, help_text, field, convert in _PROMETHEUS:
+    lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+    for name, counters in _METRICS.items():
+      lines.append(f'{metric}{{function="{_label(name)}"}} {convert(getattr(counters, field))}')
+  return "\n".join(lines) + "\n"
+#endregion
+
+#region: Instantáneas `old`
+class _Deep:
+  "Expresión de `old` cuyo valor se copia en profundidad"
+  __slots__ = ('expr',)
+
+  def __init__(self, expr: Any) -> None:
+    self.expr = expr
+
+def deep(expr: Any) -> _Deep:
+  """Marca una expresión de `old` (nombre de parámetro o función) para copiar su valor
+  con `copy.deepcopy` antes de la llamada en lugar de la copia superficial o el valor tal cual.
+  """
+  return _Deep(expr)
+
+def _old_captures(old: Dict[str, Any], sig: inspect.Signature, prefix: str,
+                  namespace: Dict[str, Any]) -> List[str]:
+  """Código que calcula cada instantánea de `old` y registra en `namespace` lo que necesita.
+  Un nombre de parámetro se copia superficialmente (`copy.copy`) y una función se evalúa
+  con los argumentos de la llamada (como una precondición) y su resultado se guarda tal cual;
+  con `deep(...)` el valor se copia en profundidad.
+  """
+  try:
+    namespace[f"{prefix}Old"] = namedtuple('old', old)
+  except ValueError as e:
+    raise ContractSignatureError(f"Nombre de instantánea 'old' inválido: {str(e)}")
+  namespace[f"{prefix}new"] = tuple.__new__
+  namespace[f"{prefix}copy"] = copy.copy
+  namespace[f"{prefix}deepcopy"] = copy.deepcopy
+  captures = []
+  for name, expr in old.items():
+    deep_copy = isinstance(expr, _Deep)
+    if deep_copy:
+      expr = expr.expr
+    if isinstance(expr, str):
+      if expr not in sig.parameters:
+        raise ContractSignatureError(f"La instantánea '{name}' usa el parámetro inexistente '{expr}'")
+      value = expr if deep_copy else f"{prefix}copy({expr})"
+    elif callable(expr):
+      if inspect.iscoroutinefunction(expr):
+        raise ContractSignatureError(f"La instantánea '{name}' no puede ser una función asíncrona")
+      namespace[f"{prefix}old_{name}"] = expr
+      value = f"{prefix}old_{name}({', '.join(_predicate_args(expr, sig))})"
+    else:
+      raise ContractSignatureError(f"La instantánea '{name}' debe ser un nombre de parámetro o una función")
+    captures.append(f"{prefix}deepcopy({value})" if deep_copy else value)
+  return captures
+#endregion
+
+#region: Compilación de contratos
+_POSITIONAL = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+
+def _predicate_error(error: Exception, stage: str) -> ContractError:
+  """Excepción con la que se informa de un error al evaluar un predicado.
+  Un `TypeError` indica argumentos incompatibles con el predicado.
+  """
+  if isinstance(error, ContractError):
+    return error
+  if isinstance(error, TypeError):
+    return ContractSignatureError(f"Error al evaluar {stage}: {str(error)}")
+  if stage == "precondición":
+    return PreconditionError(f"Error en precondición: {str(error)}")
+  return PostconditionError(f"Error en postcondición: {str(error)}")
+
+def _signature_source(sig: inspect.Signature, defaults: str) -> Tuple[str, str]:
+  """Código de la lista de parámetros de `sig` y de la llamada que los reenvía.
+  Los valores por defecto se leen del diccionario `defaults` del espacio de nombres generado.
+  """
+  params, call = [], []
+  positional_only = [p for p in sig.parameters.values() if p.kind == inspect.Parameter.POSITIONAL_ONLY]
+  keyword_only_marker = False
+  for param in sig.parameters.values():
+    name = param.name
+    default = "" if param.default is inspect.Parameter.empty else f"={defaults}[{name!r}]"
+    if param.kind == inspect.Parameter.VAR_POSITIONAL:
+      params.append(f"*{name}")
+      call.append(f"*{name}")
+      keyword_only_marker = True
+    elif param.kind == inspect.Parameter.VAR_KEYWORD:
+      params.append(f"**{name}")
+      call.append(f"**{name}")
+    elif param.kind == inspect.Parameter.KEYWORD_ONLY:
+      if not keyword_only_marker:
+        params.append("*")
+        keyword_only_marker = True
+      params.append(f"{name}{default}")
+      call.append(f"{name}={name}")
+    else:
+      params.append(f"{name}{default}")
+      call.append(name)
+      if positional_only and param is positional_only[-1]:
+        params.append("/")
+  return ", ".join(params), ", ".join(call)
+
+def _predicate_args(predicate: Callable, sig: inspect.Signature, skip: int = 0, exclude: Iterable[str] = ()) -> List[str]:
+  """Argumentos (como código) con los que se llama a un predicado.
+  Sus parámetros posicionales reciben en orden los de la función decorada (tras los
+  `skip` primeros del predicado, p. ej. `result`) y los keyword-only se emparejan por nombre.
+  Los parámetros de `exclude` (p. ej. `old`) los añade quien llama.
+  """
+  params = [p for p in list(inspect.signature(predicate).parameters.values())[skip:] if p.name not in exclude]
+  func_params = list(sig.parameters.values())
+  positional = [p.name for p in func_params if p.kind in _POSITIONAL]
+  var_positional = next((p.name for p in func_params if p.kind == inspect.Parameter.VAR_POSITIONAL), None)
+  var_keyword = next((p.name for p in func_params if p.kind == inspect.Parameter.VAR_KEYWORD), None)
+  names = {p.name for p in func_params if p.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)}
+  args: List[str] = []
+  used = set()
+  index = 0
+  for param in params:
+    if param.kind in _POSITIONAL:
+      if index < len(positional):
+        args.append(positional[index])
+        used.add(positional[index])
+        index += 1
+      elif var_positional is not None:
+        # el resto de posicionales del predicado se toma de `*args`
+        args.append(f"*{var_positional}")
+        var_positional = None
+    elif param.kind == inspect.Parameter.VAR_POSITIONAL:
+      args.extend(positional[index:])
+      used.update(positional[index:])
+      index = len(positional)
+      if var_positional is not None:
+        args.append(f"*{var_positional}")
+        var_positional = None
+    elif param.kind == inspect.Parameter.KEYWORD_ONLY:
+      if param.name in names:
+        args.append(f"{param.name}={param.name}")
+        used.add(param.name)
+    else:
+      args.extend(f"{p.name}={p.name}" for p in func_params
+                  if p.kind == inspect.Parameter.KEYWORD_ONLY and p.name not in used)
+      if var_keyword is not None:
+        args.append(f"**{var_keyword}")
+  return args
+
+class _CompiledContract:
+  """Wrapper generado para una función con contrato.
+  El código depende del nivel de aplicación y se regenera (sustituyendo `__code__`
+  del wrapper) cuando el nivel cambia, así que el nivel no se consulta en cada llamada.
+  Si la signatura de `func` no se puede obtener se reenvían `*args, **kwargs` sin más.
+  """
+
+  def __init__(self, func: Callable, require: Optional[Callable], ensure: Optional[Callable],
+               old: Optional[Dict[str, Any]] = None) -> None:
+    try:
+      sig = inspect.signature(func)
+    except (TypeError, ValueError):
+      sig = inspect.Signature([
+        inspect.Parameter('args', inspect.Parameter.VAR_POSITIONAL),
+        inspect.Parameter('kwargs', inspect.Parameter.VAR_KEYWORD),
+      ])
+    # nombres internos que no colisionen con los parámetros de la función
+    prefix = "_contract_"
+    while any(name.startswith(prefix) for name in sig.parameters):
+      prefix = "_" + prefix
+    self.prefix = prefix
+    self.namespace = {
+      f"{prefix}func": func,
+      f"{prefix}require": require,
+      f"{prefix}ensure": ensure,
+      f"{prefix}defaults": {p.name: p.default for p in sig.parameters.values()},
+      f"{prefix}calls": 0,
+      f"{prefix}error": _predicate_error,
+      f"{prefix}PreconditionError": PreconditionError,
+      f"{prefix}PostconditionError": PostconditionError,
+      f"{prefix}metrics": _new_metrics(func),
+      f"{prefix}clock": time.perf_counter_ns,
+    }
+    self.params, self.call = _signature_source(sig, f"{prefix}defaults")
+    self.require_args = None if require is None else ", ".join(_predicate_args(require, sig))
+    # instantáneas `old`: solo se calculan en las llamadas en las que se comprueba la postcondición
+    self.old = _old_captures(old, sig, prefix, self.namespace) if old else None
+    if ensure is None:
+      self.ensure_args = None
+    elif self.old is None:
+      self.ensure_args = ", ".join([f"{prefix}result"] + _predicate_args(ensure, sig, skip=1))
+    else:
+      self.ensure_args = ", ".join([f"{prefix}result"] + _predicate_args(ensure, sig, skip=1, exclude=('old',))
+                                   + [f"old={prefix}old"])
+    self.name = func.__name__ if getattr(func, '__name__', '').isidentifier() else "wrapper"
+    if inspect.iscoroutinefunction(func):
+      self.kind = 'coroutine'
+    elif inspect.isasyncgenfunction(func):
+      self.kind = 'asyncgen'
+    else:
+      self.kind = 'sync'
+    # los predicados asíncronos se esperan en la propia corrutina, sin pasar por el bucle de eventos
+    self.await_require = inspect.iscoroutinefunction(require)
+    self.await_ensure = inspect.iscoroutinefunction(ensure)
+    if self.kind == 'sync' and (self.await_require or self.await_ensure):
+      raise ContractSignatureError("Los predicados asíncronos solo pueden usarse con funciones asíncronas")
+
+  def source(self, level: str, sample_rate: int, measure: bool = False) -> str:
+    prefix = self.prefix
+    check_pre = self.require_args is not None and level != 'off'
+    check_post = self.ensure_args is not None and level in ('sampled', 'full')
+    call = f"{prefix}func({self.call})"
+    if self.kind == 'coroutine':
+      call = f"await {call}"
+    if self.kind == 'asyncgen':
+      passthrough = [f"  async for {prefix}item in {call}:", f"    yield {prefix}item", "  return"]
+    else:
+      passthrough = [f"  return {call}"]
+    
+    lines = [f"{'def' if self.kind == 'sync' else 'async def'} {self.name}({self.params}):"]
+    if measure:
+      lines.append(f"  {prefix}metrics.calls += 1")
+    if level == 'sampled' and (check_pre or check_post):
+      # solo una de cada `sample_rate` llamadas sigue hasta las comprobaciones
+      lines += [
+        f"  global {prefix}calls",
+        f"  {prefix}calls += 1",
+        f"  if {prefix}calls < {sample_rate}:",
+        *("  " + line for line in passthrough),
+        f"  {prefix}calls = 0",
+      ]
+    if measure and (check_pre or check_post):
+      lines.append(f"  {prefix}metrics.checks += 1")
+    if check_pre:
+      lines += _check_source(prefix, "require", self.require_args, "precondición", "PreconditionError",
+                             measure, self.await_require)
+    if not check_post:
+      return "\n".join(lines + passthrough)
+    if self.old is not None:
+      lines += [
+        f"  try:",
+        # `tuple.__new__` directamente: el `__new__` de `namedtuple` es una función Python
+        f"    {prefix}old = {prefix}new({prefix}Old, ({', '.join(self.old)},))",
+        f"  except Exception as {prefix}e:",
+        f"    raise {prefix}error({prefix}e, 'postcondición')",
+      ]
+    post = _check_source(prefix, "ensure", self.ensure_args, "postcondición", "PostconditionError",
+                         measure, self.await_ensure)
+    if self.kind == 'asyncgen':
+      # en un generador asíncrono la postcondición se comprueba sobre cada valor producido
+      lines.append(f"  async for {prefix}result in {call}:")
+      lines += ["  " + line for line in post]
+      lines.append(f"    yield {prefix}result")
+      return "\n".join(lines)
+    lines.append(f"  {prefix}result = {call}")
+    lines += post
+    lines.append(f"  return {prefix}result")
+    return "\n".join(lines)
+
+  def _function(self) -> Callable:
+    exec(self.source(_level, _sample_rate, _metrics_enabled), self.namespace)
+    return self.namespace[self.name]
+
+  def build(self) -> Callable:
+    wrapper = self._function()
+    _COMPILED.add(wrapper)
+    return wrapper
+
+  def recompile(self, wrapper: Callable) -> None:
+    wrapper.__code__ = self._function().__code__
+
+def _check_source(prefix: str, predicate: str, args: str, stage: str, error: str,
+                  measure: bool = False, awaited: bool = False) -> List[str]:
+  """Código de la evaluación de un predicado y de los errores que lanza.
+  Con `measure` se acumulan el tiempo del predicado y los fallos en las métricas;
+  con `awaited` el predicado es una corrutina y se espera su resultado.
+  """
+  failures = f"  {prefix}metrics.{'precondition' if predicate == 'require' else 'postcondition'}_failures += 1"
+  elapsed = f"  {prefix}metrics.predicate_time_ns += {prefix}clock() - {prefix}start"
+  lines = [f"  {prefix}start = {prefix}clock()"] if measure else []
+  lines += [
+    f"  try:",
+    f"    {prefix}ok = {'await ' if awaited else ''}{prefix}{predicate}({args})",
+    f"  except Exception as {prefix}e:",
+  ]
+  if measure:
+    lines += ["  " + elapsed, "  " + failures]
+  lines.append(f"    raise {prefix}error({prefix}e, {stage!r})")
+  if measure:
+    lines.append(elapsed)
+  lines.append(f"  if not {prefix}ok:")
+  if measure:
+    lines.append("  " + failures)
+  lines.append(f"    raise {prefix}{error}('Falló la verificación de {stage}')")
+  return lines
+#endregion
+
 #region: Decoradores
 
 def catch_contract_errors(func: Callable):
@@ -152,71 +614,464 @@ def catch_errors(func: Callable):
       return None, e
   return wrapper
 
-def contract(require: Optional[Callable] = None, ensure: Optional[Callable] = None):
+def contract(require: Optional[Callable] = None, ensure: Optional[Callable] = None,
+             old: Optional[Dict[str, Any]] = None):
   """Decorador que implementa contratos con pre y postcondiciones.
   
+  La correspondencia entre los argumentos de la función y los de los predicados se
+  calcula una sola vez al decorar y se genera un wrapper específico con la misma
+  signatura que la función, de modo que cada llamada solo añade el coste de los predicados.
+  Qué se comprueba depende del nivel de aplicación (ver `set_enforcement`).
+  
+  Con una función `async def` la postcondición se evalúa sobre el resultado esperado y
+  en un generador asíncrono sobre cada valor producido (las precondiciones, al empezar
+  a iterar). Los predicados también pueden ser `async def`. El wrapper de un generador
+  asíncrono lo recorre con `async for`, así que no reenvía `asend` ni `athrow`: los valores
+  enviados no le llegan al generador original.
+  
+  Para comparar con el estado anterior a la llamada, `old` declara las instantáneas que
+  necesita la postcondición, que las recibe en su parámetro `old` (`old.nombre`). Solo se
+  copia lo declarado y solo en las llamadas en las que se comprueba la postcondición:
+  
+    @contract(ensure=lambda result, items=None, *, old: len(items) == old.size + 1,
+              old={'size': lambda items: len(items)})
+  
   Args:
       require (Optional[Callable], optional): Función que verifica las precondiciones. Defaults to None.
       ensure (Optional[Callable], optional): Función que verifica las postcondiciones. Defaults to None.
+      old (Optional[Dict[str, Any]], optional): Instantáneas por nombre: un parámetro (copia superficial),
+          una función de los argumentos (su resultado tal cual) o `deep(...)` de cualquiera de ellos
+          (copia en profundidad). Defaults to None.
   """
   def decorator(func: Callable) -> Callable:
     # Validar signaturas en tiempo de decoración
     if require is not None: _validate_require_signature(require, func)
     
-    if ensure is not None: _validate_ensure_signature(ensure)
+    if ensure is not None: _validate_ensure_signature(ensure, old=bool(old))
+    
+    if old and ensure is None:
+      raise ContractSignatureError("Las instantáneas 'old' solo pueden usarse con una postcondición")
+    
+    if _level == 'off':
+      return func
+    
+    compiled = _CompiledContract(func, require, ensure, old)
+    wrapper = wraps(func)(compiled.build())
+    wrapper.__contract__ = compiled
+    return wrapper
+  return decorator
+#endregion
+
+#region: Contratos por lotes
+def _positional_count(func: Callable) -> int:
+  return sum(1 for p in inspect.signature(func).parameters.values() if p.kind in _POSITIONAL)
+
+def _violations(flags: Iterable[Any]) -> List[int]:
+  "Índices de los valores falsos de `flags`"
+  if hasattr(flags, 'nonzero'):
+    # array de NumPy: sin recorrerlo desde Python
+    return (flags == 0).nonzero()[0].tolist()
+  return list(compress(count(), map(not_, flags)))
+
+def _check_batch(predicate: Callable, args: tuple, vectorized: bool, stage: str) -> List[int]:
+  "Evalúa un predicado sobre todo el lote de una vez; devuelve los índices que lo incumplen"
+  try:
+    flags = predicate(*args) if vectorized else map(predicate, *args)
+    return _violations(flags)
+  except Exception as e:
+    raise _predicate_error(e, stage)
+
+def batch(require: Optional[Callable] = None, ensure: Optional[Callable] = None,
+          vectorized: bool = False, argument: Optional[str] = None):
+  """Contrato para funciones que procesan un lote (un iterable o un array) en una llamada.
+  
+  Los predicados se evalúan en una sola pasada sobre todo el lote y, si fallan, la
+  excepción (`BatchPreconditionError` o `BatchPostconditionError`) lleva en `indices`
+  todos los elementos que los incumplen, en lugar de detenerse en el primero. Si hay
+  `ensure`, el resultado debe tener un elemento por cada uno del lote; si no, se lanza
+  `BatchPostconditionError` con los índices que sobran o faltan.
+  
+  Args:
+      require (Optional[Callable], optional): Predicado de cada elemento `x -> bool`. Defaults to None.
+      ensure (Optional[Callable], optional): Predicado de cada resultado `r -> bool` o `(r, x) -> bool`. Defaults to None.
+      vectorized (bool, optional): Los predicados reciben el lote entero y devuelven un booleano por elemento
+          (p. ej. `lambda xs: xs > 0` con NumPy). Defaults to False.
+      argument (Optional[str], optional): Parámetro que recibe el lote. Defaults to el primero,
+          sin contar `self` ni `cls`.
+  """
+  def decorator(func: Callable) -> Callable:
+    if _level == 'off':
+      return func
+    
+    params = list(inspect.signature(func).parameters)
+    if argument is None:
+      # en métodos el lote es el primer parámetro después de `self` o `cls`
+      candidates = params[1:] if params[:1] in (['self'], ['cls']) else params
+      if not candidates:
+        raise ContractSignatureError("La función decorada no tiene ningún parámetro que pueda recibir el lote")
+      name = candidates[0]
+    else:
+      name = argument
+    if name not in params:
+      raise ContractSignatureError(f"La función decorada no tiene el parámetro '{name}'")
+    position = params.index(name)
+    with_inputs = ensure is not None and _positional_count(ensure) > 1
+    counters = _new_metrics(func)
+    calls = 0
     
     @wraps(func)
     def wrapper(*args, **kwargs):
-      # Verificar precondiciones
+      nonlocal calls
+      measure = _metrics_enabled
+      if measure: counters.calls += 1
+      if _level == 'off':
+        return func(*args, **kwargs)
+      if _level == 'sampled':
+        calls += 1
+        if calls < _sample_rate:
+          return func(*args, **kwargs)
+        calls = 0
+      
+      # el lote se recorre varias veces: los iteradores se materializan
+      positional = position < len(args)
+      items = args[position] if positional else kwargs[name]
+      if not hasattr(items, '__len__'):
+        items = list(items)
+        if positional:
+          args = args[:position] + (items,) + args[position + 1:]
+        else:
+          kwargs[name] = items
+      if measure: counters.checks += 1
+      
       if require is not None:
-        try:
-          # Obtener la signatura de la función require para hacer bind correcto
-          require_sig = inspect.signature(require)
-          bound_args = require_sig.bind_partial(*args, **kwargs)
-          bound_args.apply_defaults()
-          
-          if not require(*bound_args.args, **bound_args.kwargs):
-            raise PreconditionError("Falló la verificación de precondición")
-        except TypeError as e:
-          # Si hay error de signatura, intentar con los argumentos disponibles
-          try:
-            if not require(*args, **kwargs):
-              raise PreconditionError("Falló la verificación de precondición")
-          except TypeError:
-            raise ContractSignatureError(
-              f"Error al evaluar precondición: {str(e)}"
-            )
-        except Exception as e:
-          if isinstance(e, (PreconditionError, ContractSignatureError)):
-            raise
-          raise PreconditionError(f"Error en precondición: {str(e)}")
+        start = time.perf_counter_ns()
+        indices = _check_batch(require, (items,), vectorized, "precondición")
+        if measure: counters.predicate_time_ns += time.perf_counter_ns() - start
+        if indices:
+          if measure: counters.precondition_failures += 1
+          raise BatchPreconditionError(f"Falló la verificación de precondición en {len(indices)} elementos", indices)
       
-      # Ejecutar la función original
       result = func(*args, **kwargs)
+      if ensure is None or _level == 'pre':
+        return result
       
-      # Verificar postcondiciones
-      if ensure is not None:
-        try:
-          ensure_sig = inspect.signature(ensure)
-          # Intentar llamar con solo el resultado
-          if len(ensure_sig.parameters) == 1:
-            if not ensure(result):
-              raise PostconditionError("Falló la verificación de postcondición")
-          else:
-            # Llamar con resultado y argumentos disponibles
-            bound_args = ensure_sig.bind_partial(result, *args, **kwargs)
-            bound_args.apply_defaults()
-            if not ensure(*bound_args.args, **bound_args.kwargs):
-              raise PostconditionError("Falló la verificación de postcondición")
-        except TypeError as e:
-          raise ContractSignatureError(f"Error al evaluar postcondición: {str(e)}")
-        except Exception as e:
-          if isinstance(e, (PostconditionError, ContractSignatureError)):
-            raise
-          raise PostconditionError(f"Error en postcondición: {str(e)}")
-      
+      if not hasattr(result, '__len__'):
+        result = list(result)
+      if len(result) != len(items):
+        # `map` y `zip` se detendrían en el más corto sin comprobar el resto
+        if measure: counters.postcondition_failures += 1
+        missing = list(range(min(len(result), len(items)), max(len(result), len(items))))
+        raise BatchPostconditionError(
+          f"El resultado tiene {len(result)} elementos y el lote {len(items)}", missing)
+      start = time.perf_counter_ns()
+      indices = _check_batch(ensure, (result, items) if with_inputs else (result,), vectorized, "postcondición")
+      if measure: counters.predicate_time_ns += time.perf_counter_ns() - start
+      if indices:
+        if measure: counters.postcondition_failures += 1
+        raise BatchPostconditionError(f"Falló la verificación de postcondición en {len(indices)} elementos", indices)
       return result
     
     return wrapper
   return decorator
+
+contract.batch = batch
+#endregion
+
+#region: Invariantes de clase
+# tipos cuyos valores no cambian sin reasignar el atributo
+_IMMUTABLE = (int, float, complex, str, bytes, bool, type(None), frozenset, range)
+_STATE = '__invariant_state__'
+# valor registrado para un atributo que no existía al evaluar el invariante
+_MISSING = object()
+
+def _immutable(value: Any) -> bool:
+  if isinstance(value, tuple):
+    return all(isinstance(item, _IMMUTABLE) for item in value)
+  return isinstance(value, _IMMUTABLE)
+
+class _Reads:
+  "Atributos de la instancia que leyó un invariante y con qué valor (`_MISSING` si no existían)"
+  __slots__ = ('values', 'volatile')
+
+  def __init__(self) -> None:
+    self.values: Dict[str, Any] = {}
+    # se ha leído un valor mutable: puede cambiar sin que se reasigne el atributo
+    self.volatile = False
+
+# instancias cuyos invariantes se están evaluando (por `id`) -> lecturas del invariante en curso
+_RECORDING: Dict[int, _Reads] = {}
+# clases con el `__getattribute__` que registra lecturas -> [usos en curso, el suyo propio o `None`]
+_HOOKS: Dict[type, List[Any]] = {}
+
+def _recording_getattribute(cls: type, original: Callable) -> Callable:
+  """`__getattribute__` que registra las lecturas de las instancias de `_RECORDING`.
+  Los invariantes reciben la propia instancia (`len(self)`, `isinstance`, `self[i]` y los
+  operadores funcionan igual) y los métodos y propiedades que llaman leen a través de él,
+  así que sus lecturas también se registran; de los descriptores no se guarda el valor.
+  """
+  def __getattribute__(self, name):
+    reads = _RECORDING.get(id(self))
+    if reads is None or name == _STATE:
+      return original(self, name)
+    attr = inspect.getattr_static(cls, name, _MISSING)
+    kind = type(attr)
+    if hasattr(kind, '__get__') and kind is not types.MemberDescriptorType:
+      if hasattr(kind, '__set__') or hasattr(kind, '__delete__') or name not in original(self, '__dict__'):
+        return original(self, name)
+    try:
+      value = original(self, name)
+    except AttributeError:
+      reads.values[name] = _MISSING
+      raise
+    if _immutable(value):
+      reads.values[name] = value
+    else:
+      reads.volatile = True
+    return value
+  return __getattribute__
+
+def _hook(cls: type) -> bool:
+  "Instala el `__getattribute__` que registra lecturas; `False` si la clase no lo admite"
+  hook = _HOOKS.get(cls)
+  if hook is not None:
+    hook[0] += 1
+    return True
+  own = vars(cls).get('__getattribute__')
+  try:
+    cls.__getattribute__ = _recording_getattribute(cls, cls.__getattribute__)
+  except TypeError:
+    return False
+  _HOOKS[cls] = [1, own]
+  return True
+
+def _unhook(cls: type) -> None:
+  hook = _HOOKS[cls]
+  hook[0] -= 1
+  if hook[0]:
+    return
+  del _HOOKS[cls]
+  if hook[1] is None:
+    del cls.__getattribute__
+  else:
+    cls.__getattribute__ = hook[1]
+
+def _nothing(obj: Any) -> Tuple:
+  return ()
+
+def _tolerant_getter(names: Tuple[str, ...]) -> Callable[[Any], Tuple]:
+  "Como `attrgetter` pero con `_MISSING` para los atributos que no existen"
+  return lambda obj: tuple([getattr(obj, name, _MISSING) for name in names])
+
+class _InvariantState:
+  """Estado por instancia: los atributos (y sus valores) que leyó cada invariante en su
+  última evaluación y una instantánea de todos ellos que se compara en una sola operación.
+  """
+  __slots__ = ('evaluated', 'reads', 'volatile', 'clean', 'getter', 'snapshot', 'depth')
+
+  def __init__(self, count: int) -> None:
+    self.evaluated = False
+    self.reads: List[Dict[str, Any]] = [{} for _ in range(count)]
+    # invariantes que se reevalúan siempre: leyeron valores mutables o están fallando
+    self.volatile = set()
+    # basta comparar la instantánea para saber si hay algo que reevaluar
+    self.clean = False
+    self.getter: Callable = _nothing
+    self.snapshot: Tuple = ()
+    self.depth = 0
+
+  def changed(self, obj: Any) -> List[int]:
+    "Invariantes que hay que reevaluar"
+    return [k for k, reads in enumerate(self.reads)
+            if k in self.volatile or any(getattr(obj, name, _MISSING) != value for name, value in reads.items())]
+
+  def freeze(self, obj: Any) -> None:
+    reads: Dict[str, Any] = {}
+    for k, values in enumerate(self.reads):
+      if k not in self.volatile:
+        reads.update(values)
+    names = tuple(reads)
+    if any(value is _MISSING for value in reads.values()):
+      self.getter = _tolerant_getter(names)
+    elif len(names) > 1:
+      self.getter = attrgetter(*names)
+    elif names:
+      # con un solo nombre `attrgetter` devuelve el valor y no una tupla
+      self.getter = attrgetter(*names, *names)
+    else:
+      self.getter = _nothing
+    self.snapshot = self.getter(obj)
+    self.clean = self.evaluated and not self.volatile
+
+  def unchanged(self, obj: Any) -> bool:
+    try:
+      return self.clean and self.getter(obj) == self.snapshot
+    except AttributeError:
+      return False
+
+def _state(obj: Any) -> Optional[_InvariantState]:
+  "Estado de `obj`, o `None` si la instancia no tiene `__dict__` en el que guardarlo"
+  try:
+    return obj.__invariant_state__
+  except AttributeError:
+    pass
+  state = _InvariantState(len(type(obj).__invariants__))
+  try:
+    object.__setattr__(obj, _STATE, state)
+  except AttributeError:
+    return None
+  return state
+
+def _check_all(obj: Any) -> None:
+  "Evalúa todos los invariantes sin seguimiento (instancias sin `__dict__`)"
+  for predicate in type(obj).__invariants__:
+    try:
+      ok = predicate(obj)
+    except Exception as e:
+      raise InvariantError(f"Error en invariante {predicate.__name__}: {str(e)}")
+    if not ok:
+      raise InvariantError(f"Falló la verificación del invariante {predicate.__name__}")
+
+def check_invariants(obj: Any, force: bool = False, state: Optional[_InvariantState] = None) -> None:
+  """Evalúa los invariantes de `obj` cuyas entradas cambiaron desde la última comprobación
+  (todos con `force`). Si ningún atributo leído por los invariantes cambió, la comprobación
+  es una sola comparación de tuplas. Se reevalúan siempre los invariantes que leyeron un
+  valor mutable (una lista puede cambiar sin reasignar el atributo) y los que fallaron.
+  Las instancias sin `__dict__` (clases con `__slots__`) no guardan estado y se evalúan todos.
+  """
+  state = state or _state(obj)
+  if state is None:
+    _check_all(obj)
+    return
+  if not force and state.unchanged(obj):
+    return
+  cls = type(obj)
+  invariants = cls.__invariants__
+  indices = range(len(invariants)) if force or not state.evaluated else state.changed(obj)
+  if not indices:
+    state.evaluated = True
+    state.freeze(obj)
+    return
+  hooked = _hook(cls)
+  key = id(obj)
+  outer = _RECORDING.get(key)
+  # los métodos públicos que llamen los invariantes no vuelven a comprobarlos
+  state.depth += 1
+  try:
+    for k in indices:
+      predicate = invariants[k]
+      reads = _RECORDING[key] = _Reads()
+      try:
+        ok = predicate(obj)
+      except Exception as e:
+        state.volatile.add(k)
+        raise InvariantError(f"Error en invariante {predicate.__name__}: {str(e)}")
+      state.reads[k] = reads.values
+      # sin el `__getattribute__` que registra no se sabe qué leyó: se reevalúa siempre
+      if reads.volatile or not hooked or not ok:
+        state.volatile.add(k)
+      else:
+        state.volatile.discard(k)
+      if not ok:
+        raise InvariantError(f"Falló la verificación del invariante {predicate.__name__}")
+  finally:
+    state.depth -= 1
+    if outer is None:
+      del _RECORDING[key]
+    else:
+      _RECORDING[key] = outer
+    if hooked:
+      _unhook(cls)
+    state.evaluated = True
+    state.freeze(obj)
+
+# profundidad de llamadas en curso de las instancias sin `__dict__`, por `id`
+_DEPTHS: Dict[int, int] = {}
+
+def _fully_checked(method: Callable, obj: Any, args: tuple, kwargs: Dict[str, Any]) -> Any:
+  key = id(obj)
+  depth = _DEPTHS.get(key, 0)
+  _DEPTHS[key] = depth + 1
+  try:
+    result = method(obj, *args, **kwargs)
+  finally:
+    if depth:
+      _DEPTHS[key] = depth
+    else:
+      del _DEPTHS[key]
+  if not depth and _level != 'off' and _level != 'pre':
+    _check_all(obj)
+  return result
+
+def _checked_method(method: Callable) -> Callable:
+  "Método que comprueba los invariantes al terminar la llamada más externa sobre la instancia"
+  @wraps(method)
+  def wrapper(self, *args, **kwargs):
+    # atributo normal: leer `self.__dict__` obligaría a materializar el diccionario
+    try:
+      state = self.__invariant_state__
+    except AttributeError:
+      state = _state(self)
+      if state is None:
+        return _fully_checked(method, self, args, kwargs)
+    state.depth += 1
+    try:
+      result = method(self, *args, **kwargs)
+    finally:
+      state.depth -= 1
+    if not state.depth and _level != 'off' and _level != 'pre':
+      # camino rápido en línea: ningún atributo leído por los invariantes cambió
+      try:
+        unchanged = state.clean and state.getter(self) == state.snapshot
+      except AttributeError:
+        unchanged = False
+      if not unchanged:
+        check_invariants(self, state=state)
+    return result
+  wrapper.__invariant_checked__ = True
+  return wrapper
+
+def invariant(*predicates: Callable):
+  """Decorador de clase que declara invariantes `self -> bool`.
+  
+  Se comprueban al terminar `__init__` y cada método público (solo en la llamada más
+  externa: un método que llama a otro no comprueba a mitad). Para no reevaluarlos todos
+  en cada llamada se registra qué atributos lee cada invariante y con qué valor; solo se
+  reevalúan los invariantes cuyas entradas cambiaron (ver `check_invariants`).
+  Puede aplicarse varias veces; los invariantes se acumulan (también con la herencia) y
+  los métodos de las subclases también los comprueban.
+  Con el nivel de aplicación `'off'` la clase se devuelve sin cambios y con `'pre'` no se comprueban.
+  """
+  def decorator(cls: type) -> type:
+    if _level == 'off':
+      return cls
+    inherited = hasattr(cls, '__invariants__')
+    cls.__invariants__ = tuple(getattr(cls, '__invariants__', ())) + predicates
+    _wrap_methods(cls)
+    if not inherited:
+      _wrap_subclasses(cls)
+    return cls
+  return decorator
+
+def _wrap_methods(cls: type) -> None:
+  "Envuelve `__init__` y los métodos públicos definidos en `cls`"
+  for name, attr in list(vars(cls).items()):
+    if not inspect.isfunction(attr) or getattr(attr, '__invariant_checked__', False):
+      continue
+    if name == '__init__' or not name.startswith('_'):
+      setattr(cls, name, _checked_method(attr))
+
+def _wrap_subclasses(cls: type) -> None:
+  "Hace que las subclases también comprueben los invariantes en sus propios métodos"
+  original = vars(cls).get('__init_subclass__')
+  def __init_subclass__(subclass, **kwargs):
+    if original is not None:
+      original.__func__(subclass, **kwargs)
+    else:
+      super(cls, subclass).__init_subclass__(**kwargs)
+    _wrap_methods(subclass)
+  cls.__init_subclass__ = classmethod(__init_subclass__)
 #endregion
+
+set_enforcement(os.environ.get('CONTRACTS_LEVEL', 'full').strip().lower(),
+                int(os.environ.get('CONTRACTS_SAMPLE_RATE', _sample_rate)))
+enable_metrics(os.environ.get('CONTRACTS_METRICS', '') not in ('', '0'))
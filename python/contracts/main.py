@@ -1,8 +1,11 @@
+import asyncio
+
 from contracts import (
-  contract, 
+  contract, invariant, 
   catch_contract_errors, catch_errors, 
   _validate_ensure_signature, _validate_require_signature,
   ContractError, PostconditionError, PreconditionError, ContractSignatureError, 
+  BatchPreconditionError, InvariantError,
 )
 
 def test1() -> None:
@@ -103,6 +106,116 @@ def test4() -> None:
       print(f"{func.__name__}: Inválida correctamente - {e}")
 
 
+def test5() -> None:
+  # contrato por lotes: se informa de todos los elementos inválidos a la vez
+  @contract.batch(require=lambda x: x >= 0, ensure=lambda result, x: abs(result * result - x) < 1e-9)
+  def square_roots(values: list) -> list:
+    return [x ** 0.5 for x in values]
+  
+  print(square_roots([1, 4, 9]))
+  try:
+    square_roots([1, -4, 9, -16])
+  except BatchPreconditionError as e:
+    print(f"{e}: {e.indices}")
+
+
+def test6() -> None:
+  # invariantes de clase: solo se reevalúan los que leen atributos modificados
+  @invariant(lambda self: self.balance >= 0, lambda self: self.limit > 0)
+  class Account:
+    def __init__(self, balance: float, limit: float) -> None:
+      self.balance, self.limit = balance, limit
+
+    def withdraw(self, amount: float) -> None:
+      self.balance -= amount
+
+  account = Account(10, 100)
+  account.withdraw(5)
+  print(account.balance)
+  try:
+    account.withdraw(10)
+  except InvariantError as e:
+    print(e)
+
+
+def test7() -> None:
+  # instantáneas `old`: solo se guarda la longitud previa, no una copia de la lista
+  @contract(ensure=lambda result, items=None, value=None, *, old: len(items) == old.size + 1,
+            old={'size': lambda items: len(items)})
+  def push(items: list, value: float) -> None:
+    items.append(value)
+  
+  @contract(ensure=lambda result, items=None, value=None, *, old: len(items) == old.size + 1,
+            old={'size': lambda items: len(items)})
+  def push_twice(items: list, value: float) -> None:
+    items += [value, value]
+  
+  items = [1.0]
+  push(items, 2.0)
+  print(items)
+  try:
+    push_twice(items, 3.0)
+  except PostconditionError as e:
+    print(e)
+
+
+def test8() -> None:
+  # contratos sobre corrutinas y generadores asíncronos
+  async def is_positive(x: float) -> bool:
+    await asyncio.sleep(0)
+    return x > 0
+  
+  @contract(require=is_positive, ensure=lambda result: result > 1)
+  async def fetch(x: float) -> float:
+    await asyncio.sleep(0)
+    return x * 2
+  
+  @contract(ensure=lambda result: result < 3)
+  async def count_up(n: int):
+    for i in range(n):
+      yield i
+  
+  async def run() -> None:
+    print(await fetch(3.0))
+    for x in (-1.0, 0.25):
+      try:
+        await fetch(x)
+      except (PreconditionError, PostconditionError) as e:
+        print(f"fetch({x}): {type(e).__name__}: {e}")
+    print([i async for i in count_up(3)])
+    try:
+      [i async for i in count_up(5)]
+    except PostconditionError as e:
+      print(f"count_up(5): {e}")
+  
+  asyncio.run(run())
+
+
+def test9() -> None:
+  # los invariantes reciben la propia instancia: `len(self)` y `self[i]` funcionan
+  @invariant(lambda self: len(self) <= self.capacity, lambda self: not len(self) or self[-1] is not None)
+  class Stack:
+    def __init__(self, capacity: int) -> None:
+      self.capacity, self.items = capacity, []
+
+    def __len__(self) -> int:
+      return len(self.items)
+
+    def __getitem__(self, index: int) -> object:
+      return self.items[index]
+
+    def push(self, value: object) -> None:
+      self.items.append(value)
+
+  stack = Stack(2)
+  stack.push(1)
+  stack.push(2)
+  print(len(stack))
+  try:
+    stack.push(3)
+  except InvariantError as e:
+    print(e)
+
 
 # Ejemplos de uso y pruebas
 if __name__ == "__main__":
@@ -110,4 +223,9 @@ if __name__ == "__main__":
   #test2()
   #test3()
   test4()
+  test5()
+  test6()
+  test7()
+  test8()
+  test9()
   
@@ -0,0 +1,78 @@
+"""Coste por llamada de `memoize` frente a `functools.lru_cache` y de medir tiempos con `timed`.
+
+Ejecutar: `python benchmark.py`
+"""
+import random
+import timeit
+from functools import lru_cache
+from typing import Callable, Dict
+
+from utils import measure_time, memoize, timed
+
+def _square(x: int) -> int:
+  return x * x
+
+def _variants(maxsize: int) -> Dict[str, Callable]:
+  return {
+    'lru_cache':      lru_cache(maxsize=maxsize)(_square),
+    'memoize':        memoize(maxsize=maxsize)(_square),
+    'memoize (ttl)':  memoize(maxsize=maxsize, ttl=60)(_square),
+    'memoize (key)':  memoize(maxsize=maxsize, key=lambda x: x)(_square),
+  }
+
+def hits(number: int = 100_000, repeat: int = 5) -> Dict[str, float]:
+  "Tiempo por llamada (ns) cuando el resultado ya está en caché"
+  times = {}
+  for name, func in _variants(128).items():
+    func(7)
+    times[name] = min(timeit.repeat(lambda: func(7), number=number, repeat=repeat)) / number * 1e9
+  return times
+
+def misses(number: int = 100_000, repeat: int = 5, maxsize: int = 128) -> Dict[str, float]:
+  "Tiempo por llamada (ns) cuando cada argumento es nuevo y hay que descartar la entrada más antigua"
+  times = {}
+  for name, func in _variants(maxsize).items():
+    best = float('inf')
+    for _ in range(repeat):
+      values = range(number)
+      best = min(best, timeit.timeit(lambda: [func(x) for x in values], number=1))
+    times[name] = best / number * 1e9
+  return times
+
+def workload(number: int = 100_000, keys: int = 200, maxsize: int = 128) -> Dict[str, float]:
+  "Tiempo por llamada (ns) y porcentaje de aciertos con `keys` argumentos al azar y una caché más pequeña"
+  rng = random.Random(0)
+  values = [rng.randrange(keys) for _ in range(number)]
+  times = {}
+  for name, func in _variants(maxsize).items():
+    times[name] = min(timeit.repeat(lambda: [func(x) for x in values], number=1, repeat=5)) / number * 1e9
+    info = func.cache_info()
+    times[name + ' aciertos %'] = 100 * info.hits / (info.hits + info.misses)
+  return times
+
+def timing(number: int = 100_000, repeat: int = 5) -> Dict[str, float]:
+  "Tiempo por llamada (ns) de una función trivial sin medir, con `measure_time` y con `timed` a varias tasas"
+  variants = {
+    'sin medir':         _square,
+    'measure_time':      measure_time(_square),
+    'timed':             timed()(_square),
+    'timed (1 de 100)':  timed(0.01)(_square),
+    'timed (apagado)':   timed(0)(_square),
+  }
+  return {name: min(timeit.repeat(lambda: func(7), number=number, repeat=repeat)) / number * 1e9
+          for name, func in variants.items()}
+
+
+if __name__ == "__main__":
+  print("== aciertos ==")
+  for name, elapsed in hits().items():
+    print(f"{name:>16}: {elapsed:8.1f} ns/llamada")
+  print("== fallos con expulsión ==")
+  for name, elapsed in misses().items():
+    print(f"{name:>16}: {elapsed:8.1f} ns/llamada")
+  print("== 200 claves, caché de 128 ==")
+  for name, value in workload().items():
+    print(f"{name:>27}: {value:8.1f}")
+  print("== medición de tiempos ==")
+  for name, elapsed in timing().items():
+    print(f"{name:>17}: {elapsed:8.1f} ns/llamada")
@@ -7,7 +7,9 @@ from utils import (
   
   times,   
   delay,   
-  rescue  
+  rescue,
+  memoize, # Decorador para guardar resultados de funciones puras
+  timed    # Decorador para acumular estadísticas de tiempo sin cambiar el resultado
 )
 
 
@@ -27,11 +29,17 @@ def slow_factorial(n:int) -> int:
   if n < 0: return -1
   return aux_factorial(n)  
 
+@memoize()
 def aux_factorial(n:int) -> int:
   slow_operation()
   if n == 1 or n == 0: return 1 
   return n*aux_factorial(n-1)
 
+# Ejemplo: Acumular tiempos de una función usada muchas veces
+@timed()
+def fast_square(x:int) -> int:
+  return x*x
+
 # Ejemplo: Manejar errores en funciones
 @handle_errors
 def division(a:float, b:float) -> float:
@@ -68,6 +76,10 @@ def complex_function(value: str) -> str:
 if __name__ == "__main__":
   #slow_operation()
   #print(slow_factorial(4))
+  #print(slow_factorial(5))  # reutiliza los factoriales ya calculados
+  #print(aux_factorial.cache_info())
+  #for i in range(1000): fast_square(i)
+  #print(fast_square.timing())
   #result = slow_square(10)
   #print(result)
   
@@ -1,5 +1,7 @@
 import time 
-from typing import Callable
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, Hashable, List, Optional
 from functools import wraps
 
 
@@ -87,3 +89,247 @@ def rescue(rescue_func: Callable) -> Callable:
         return rescue_func(*args, **kwargs)
     return wrapper
   return decorator
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# separa los argumentos posicionales de los nombrados en la clave por defecto
+_KWARGS_MARK = object()
+
+# posiciones de cada entrada de la caché: [valor, expiración, aciertos, fallos]
+_VALUE, _EXPIRES, _HITS, _MISSES = range(4)
+
+def memoize(maxsize: Optional[int] = 128, ttl: Optional[float] = None,
+            key: Optional[Callable[..., Hashable]] = None) -> Callable:
+  """Decorador que guarda los resultados de una función pura para no recalcularlos.
+
+  - `maxsize`: número máximo de resultados; al superarlo se descarta el usado hace más
+    tiempo (LRU). `None` no limita el tamaño.
+  - `ttl`: segundos que vale un resultado; pasado ese tiempo se vuelve a calcular. Al
+    guardar un resultado se descartan los caducados del extremo menos usado de la caché.
+  - `key`: función que recibe los mismos argumentos y devuelve una clave hashable, para
+    argumentos que no lo son (p. ej. `key=lambda items: tuple(items)`).
+
+  La caché se puede usar desde varios hilos: el acceso está protegido por un cerrojo que
+  no se mantiene mientras se ejecuta la función, así que las llamadas recursivas funcionan
+  (dos hilos que fallan a la vez con la misma clave la calculan los dos).
+
+  La función decorada tiene `cache_info()` (totales como `functools.lru_cache`),
+  `cache_stats()` (aciertos y fallos de cada clave en caché) y `cache_clear()`.
+
+  Args:
+      maxsize (Optional[int], optional): Tamaño máximo de la caché. Defaults to 128.
+      ttl (Optional[float], optional): Tiempo de vida de cada resultado en segundos. Defaults to None.
+      key (Optional[Callable[..., Hashable]], optional): Función que calcula la clave. Defaults to None.
+  """
+  clock = time.monotonic
+
+  def decorator(func: Callable) -> Callable:
+    cache: "OrderedDict[Hashable, list]" = OrderedDict()
+    lock = threading.Lock()
+    totals = [0, 0]
+
+    # `acquire`/`release` directos: la mitad de coste que `with lock` en cada llamada
+    acquire, release = lock.acquire, lock.release
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      if key is not None:
+        k = key(*args, **kwargs)
+      else:
+        k = args if not kwargs else args + (_KWARGS_MARK,) + tuple(kwargs.items())
+      acquire()
+      try:
+        entry = cache.get(k)
+        if entry is not None and (ttl is None or entry[_EXPIRES] > clock()):
+          cache.move_to_end(k)
+          entry[_HITS] += 1
+          totals[0] += 1
+          return entry[_VALUE]
+        totals[1] += 1
+      finally:
+        release()
+      value = func(*args, **kwargs)
+      acquire()
+      try:
+        # las estadísticas de la clave se conservan si el resultado había caducado
+        if entry is None:
+          cache[k] = [value, None if ttl is None else clock() + ttl, 0, 1]
+        else:
+          cache[k] = [value, None if ttl is None else clock() + ttl, entry[_HITS], entry[_MISSES] + 1]
+        cache.move_to_end(k)
+        if maxsize is not None and len(cache) > maxsize:
+          cache.popitem(last=False)
+        if ttl is not None:
+          # descarta los resultados caducados del principio (los menos usados) para que
+          # la caché no crezca sin límite con claves que no se repiten
+          now = clock()
+          while cache and next(iter(cache.values()))[_EXPIRES] <= now:
+            cache.popitem(last=False)
+      finally:
+        release()
+      return value
+
+    def cache_info() -> CacheInfo:
+      with lock:
+        return CacheInfo(totals[0], totals[1], maxsize, len(cache))
+
+    def cache_stats() -> Dict[Hashable, Dict[str, int]]:
+      with lock:
+        return {k: {"hits": entry[_HITS], "misses": entry[_MISSES]} for k, entry in cache.items()}
+
+    def cache_clear() -> None:
+      with lock:
+        cache.clear()
+        totals[:] = [0, 0]
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_stats = cache_stats
+    wrapper.cache_clear = cache_clear
+    return wrapper
+  return decorator
+
+
+# bits de la mantisa de cada cubeta del histograma: error relativo máximo de 1/16
+_SUB_BITS = 4
+_BUCKETS = (64 - _SUB_BITS) << _SUB_BITS
+
+class TimingHistogram:
+  """Histograma de duraciones en nanosegundos con cubetas log-lineales (como HdrHistogram).
+  Cada potencia de dos se divide en 16 cubetas, así que los cuantiles se estiman con un
+  error relativo menor del 6 % ocupando memoria constante, sin guardar las muestras.
+  """
+  __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+  def __init__(self) -> None:
+    self.reset()
+
+  def reset(self) -> None:
+    self.count = 0
+    self.total = 0
+    self.min = None
+    self.max = None
+    self.buckets: List[int] = [0] * _BUCKETS
+
+  def add(self, ns: int) -> None:
+    self.count += 1
+    self.total += ns
+    if self.min is None or ns < self.min:
+      self.min = ns
+    if self.max is None or ns > self.max:
+      self.max = ns
+    shift = ns.bit_length() - _SUB_BITS - 1
+    if shift < 0:
+      self.buckets[ns] += 1
+    else:
+      self.buckets[(shift << _SUB_BITS) + (ns >> shift)] += 1
+
+  @staticmethod
+  def _value(index: int) -> float:
+    "Punto medio de la cubeta `index`"
+    shift = (index >> _SUB_BITS) - 1
+    if shift < 0:
+      return float(index)
+    low = (index - (shift << _SUB_BITS)) << shift
+    return low + ((1 << shift) - 1) / 2
+
+  def quantile(self, q: float) -> Optional[float]:
+    "Valor aproximado por debajo del cual queda la fracción `q` de las muestras"
+    if not self.count:
+      return None
+    rank = max(1, round(q * self.count))
+    seen = 0
+    for index, n in enumerate(self.buckets):
+      seen += n
+      if seen >= rank:
+        # el valor exacto de los extremos es conocido
+        return float(min(max(self._value(index), self.min), self.max))
+    return float(self.max)
+
+  def as_dict(self) -> Dict[str, Optional[float]]:
+    return {
+      "count": self.count,
+      "min": self.min,
+      "max": self.max,
+      "mean": self.total / self.count if self.count else None,
+      "p50": self.quantile(0.50),
+      "p95": self.quantile(0.95),
+      "p99": self.quantile(0.99),
+    }
+
+# nombre completo de la función -> histograma, uno por cada función decorada
+_TIMINGS: Dict[str, TimingHistogram] = {}
+
+def _register_timing(func: Callable, histogram: TimingHistogram) -> str:
+  "Registra `histogram` en `_TIMINGS` con un nombre único (`nombre`, `nombre#2`, ...) y lo devuelve"
+  qualname = getattr(func, '__qualname__', None)
+  module = getattr(func, '__module__', None)
+  if qualname is None:
+    base = repr(func)
+  else:
+    base = f"{module}.{qualname}" if module else qualname
+  name, n = base, 1
+  while name in _TIMINGS:
+    n += 1
+    name = f"{base}#{n}"
+  _TIMINGS[name] = histogram
+  return name
+
+def timed(sample_rate: float = 1.0) -> Callable:
+  """Decorador que mide la duración de cada llamada con `time.perf_counter_ns` y la acumula
+  en un histograma por función, sin cambiar el valor devuelto (a diferencia de `measure_time`).
+
+  - `sample_rate`: fracción de llamadas que se miden (una de cada `round(1 / sample_rate)`).
+    Con `0` se devuelve la propia función, sin ningún coste añadido.
+
+  Las estadísticas (número de llamadas medidas, mínimo, máximo, media y percentiles 50, 95 y
+  99 en nanosegundos) se consultan con `func.timing()` o con `timings()` para todas las
+  funciones; cada función decorada tiene su propio histograma, y si dos comparten nombre
+  (lambdas, funciones locales) la segunda aparece como `nombre#2`. Los contadores no usan cerrojo: con varios hilos alguna muestra puede perderse.
+
+  Args:
+      sample_rate (float, optional): Fracción de llamadas medidas, entre 0 y 1. Defaults to 1.0.
+  """
+  if not 0 <= sample_rate <= 1:
+    raise ValueError("sample_rate debe estar entre 0 y 1")
+
+  def decorator(func: Callable) -> Callable:
+    if sample_rate == 0:
+      return func
+    histogram = TimingHistogram()
+    _register_timing(func, histogram)
+    add, clock = histogram.add, time.perf_counter_ns
+    every = round(1 / sample_rate)
+
+    if every == 1:
+      @wraps(func)
+      def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+          return func(*args, **kwargs)
+        finally:
+          add(clock() - start)
+    else:
+      countdown = every
+
+      @wraps(func)
+      def wrapper(*args, **kwargs):
+        nonlocal countdown
+        countdown -= 1
+        if countdown:
+          return func(*args, **kwargs)
+        countdown = every
+        start = clock()
+        try:
+          return func(*args, **kwargs)
+        finally:
+          add(clock() - start)
+
+    wrapper.timing = histogram.as_dict
+    wrapper.timing_reset = histogram.reset
+    return wrapper
+  return decorator
+
+def timings() -> Dict[str, Dict[str, Optional[float]]]:
+  "Estadísticas de todas las funciones decoradas con `timed`, por nombre completo (`módulo.función`, con `#n` si se repite)"
+  return {name: histogram.as_dict() for name, histogram in _TIMINGS.items()}
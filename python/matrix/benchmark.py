@@ -0,0 +1,313 @@
+"""Benchmarks de `Matrix` por motor de almacenamiento.
+
+Ejecutar: `python benchmark.py` (comparativa rápida entre motores) o
+`python benchmark.py --suite` para la batería completa: barre tamaños, dtypes
+y motores, mide ops/s, pico de memoria y bloques reservados con `tracemalloc`,
+guarda los resultados en JSON y los compara con una línea base:
+
+  python benchmark.py --suite --output base.json
+  python benchmark.py --suite --baseline base.json --threshold 0.2
+
+`python benchmark.py --linalg` mide las factorizaciones y estima su orden de
+crecimiento (la pendiente en escala log-log debería acercarse a 3).
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from matrix import Matrix
+from storage import available_backends
+
+OPERATIONS: Dict[str, Callable[[Matrix, Matrix], Matrix]] = {
+  'add':     lambda a, b: a + b,
+  'mul':     lambda a, b: a * b,
+  'as_type': lambda a, b: a.as_type('int64'),
+}
+
+# Operaciones de la batería completa; `iter` y `str` solo usan el primer operando
+SUITE_OPERATIONS: Dict[str, Callable[[Matrix, Matrix], Any]] = {
+  **OPERATIONS,
+  'iter': lambda a, b: sum(1 for _ in a),
+  'str':  lambda a, b: str(a),
+}
+
+def random_matrix(n: int, storage: str = 'list', dtype: str = 'float64', seed: int = 0) -> Matrix:
+  rng = random.Random(seed)
+  if dtype.startswith('float'):
+    rows = [[rng.random() for _ in range(n)] for _ in range(n)]
+  else:
+    rows = [[rng.randint(-100, 100) for _ in range(n)] for _ in range(n)]
+  return Matrix(rows, storage=storage, dtype=dtype)
+
+def best_time(func: Callable[[], object], repeat: int = 3) -> float:
+  "Mejor tiempo (en segundos) de `repeat` ejecuciones"
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    best = min(best, time.perf_counter() - start)
+  return best
+
+def sweep(operation: str, sizes: Sequence[int], backends: Optional[List[str]] = None) -> Dict[str, Dict[int, float]]:
+  "Tiempos de `operation` para cada motor y tamaño `n x n`"
+  backends = backends or available_backends()
+  op = OPERATIONS[operation]
+  results: Dict[str, Dict[int, float]] = {name: {} for name in backends}
+  for n in sizes:
+    for name in backends:
+      a, b = random_matrix(n, name, seed=1), random_matrix(n, name, seed=2)
+      results[name][n] = best_time(lambda: op(a, b))
+  return results
+
+class _CursorMatrix(Matrix):
+  "Protocolo de iteración anterior: la matriz es su propio iterador y guarda el cursor como atributos"
+
+  def __iter__(self):
+    self._iter_row = 0
+    self._iter_col = 0
+    return self
+
+  def __next__(self):
+    if self._iter_row >= self._storage.rows:
+      raise StopIteration
+    value = self._storage.get(self._iter_row, self._iter_col)
+    self._iter_col += 1
+    if self._iter_col >= self._storage.cols:
+      self._iter_col = 0
+      self._iter_row += 1
+    return value
+
+def iteration(n: int, storage: str = 'list') -> Dict[str, float]:
+  "Tiempo de recorrer una matriz `n x n` con el protocolo anterior, el actual e `itertools.chain`"
+  matrix = random_matrix(n, storage)
+  cursor = _CursorMatrix._wrap(matrix._storage)
+  rows = matrix.data
+  consume = lambda iterable: sum(1 for _ in iterable)
+  return {
+    'cursor':          best_time(lambda: consume(cursor)),
+    '__iter__':        best_time(lambda: consume(matrix)),
+    'enumerate_cells': best_time(lambda: consume(matrix.enumerate_cells())),
+    'chain':           best_time(lambda: consume(chain.from_iterable(rows))),
+  }
+
+def crossover(results: Dict[str, Dict[int, float]], fast: str, slow: str) -> Optional[int]:
+  "Menor tamaño a partir del cual el motor `fast` supera a `slow`"
+  for n, elapsed in sorted(results[fast].items()):
+    if elapsed < results[slow][n]:
+      return n
+  return None
+
+#region: Batería completa
+def _timed(func: Callable[[], object], number: int) -> float:
+  start = time.perf_counter()
+  for _ in range(number):
+    func()
+  return time.perf_counter() - start
+
+def ops_per_sec(func: Callable[[], object], min_time: float = 0.2, repeat: int = 3) -> float:
+  "Operaciones por segundo: mejor de `repeat` rondas de al menos `min_time` segundos"
+  # calibra el número de llamadas por ronda
+  number = 1
+  while True:
+    elapsed = _timed(func, number)
+    if elapsed >= min_time / 10 or number >= 1 << 20:
+      break
+    number *= 10
+  number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+  return max(number / _timed(func, number) for _ in range(repeat))
+
+def memory(func: Callable[[], object]) -> Dict[str, int]:
+  """Pico de memoria (bytes) durante una llamada y bloques reservados que siguen vivos
+  al terminar (los del resultado), según `tracemalloc`.
+  """
+  tracing = tracemalloc.is_tracing()
+  if not tracing:
+    tracemalloc.start()
+  try:
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1] - start
+    after = tracemalloc.take_snapshot()
+    del result
+  finally:
+    if not tracing:
+      tracemalloc.stop()
+  retained = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+  return {'peak_bytes': peak, 'retained_blocks': retained}
+
+def suite(sizes: Sequence[int], dtypes: Sequence[str] = ('int64', 'float64'),
+          backends: Optional[List[str]] = None, operations: Optional[List[str]] = None,
+          min_time: float = 0.2) -> List[Dict[str, Any]]:
+  "Mide cada operación para cada motor, dtype y tamaño `n x n`; una fila por combinación"
+  backends = backends or available_backends()
+  operations = operations or list(SUITE_OPERATIONS)
+  results = []
+  for operation in operations:
+    op = SUITE_OPERATIONS[operation]
+    for name in backends:
+      for dtype in dtypes:
+        for n in sizes:
+          a, b = random_matrix(n, name, dtype, seed=1), random_matrix(n, name, dtype, seed=2)
+          call = lambda: op(a, b)
+          results.append({
+            'operation': operation, 'storage': name, 'dtype': dtype, 'n': n,
+            'ops_per_sec': ops_per_sec(call, min_time),
+            **memory(call),
+          })
+  return results
+
+def _key(entry: Dict[str, Any]) -> tuple:
+  return entry['operation'], entry['storage'], entry['dtype'], entry['n']
+
+def save(results: List[Dict[str, Any]], path: str) -> None:
+  "Guarda los resultados en JSON junto con la versión de Python y la plataforma"
+  with open(path, 'w') as f:
+    json.dump({
+      'python': sys.version.split()[0],
+      'platform': platform.platform(),
+      'results': results,
+    }, f, indent=2)
+
+def load(path: str) -> List[Dict[str, Any]]:
+  with open(path) as f:
+    return json.load(f)['results']
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float = 0.1) -> List[Dict[str, Any]]:
+  """Regresiones respecto a `baseline`: combinaciones cuyas ops/s bajan o cuyo pico
+  de memoria sube más de `threshold` (fracción, `0.1` = 10 %).
+  """
+  base = {_key(entry): entry for entry in baseline}
+  regressions = []
+  for entry in results:
+    old = base.get(_key(entry))
+    if old is None:
+      continue
+    speed = entry['ops_per_sec'] / old['ops_per_sec'] - 1
+    growth = entry['peak_bytes'] / old['peak_bytes'] - 1 if old['peak_bytes'] else 0.0
+    if speed < -threshold or growth > threshold:
+      regressions.append({**entry, 'speed_change': speed, 'memory_change': growth})
+  return regressions
+
+def report(results: List[Dict[str, Any]]) -> None:
+  print(f"{'operation':>9} {'storage':>7} {'dtype':>7} {'n':>5} {'ops/s':>12} {'peak':>10} {'retained':>8}")
+  for entry in results:
+    print(f"{entry['operation']:>9} {entry['storage']:>7} {entry['dtype']:>7} {entry['n']:>5} "
+          f"{entry['ops_per_sec']:>12.1f} {entry['peak_bytes'] / 1024:>8.1f}kB {entry['retained_blocks']:>8}")
+#endregion
+
+#region: Álgebra lineal
+LINALG: Dict[str, Callable[[Matrix, Matrix], Any]] = {
+  'lu':       lambda a, b: a.lu(),
+  'cholesky': lambda a, b: a.cholesky(),
+  'solve':    lambda a, b: a.solve(b),
+  'inverse':  lambda a, b: a.inverse(),
+  'det':      lambda a, b: a.det(),
+}
+
+def spd_matrix(n: int, storage: str = 'list', seed: int = 0) -> Matrix:
+  "Matriz simétrica definida positiva (diagonal dominante)"
+  rng = random.Random(seed)
+  rows = [[0.0] * n for _ in range(n)]
+  for i in range(n):
+    for j in range(i):
+      rows[i][j] = rows[j][i] = rng.random()
+    rows[i][i] = n + 1.0
+  return Matrix(rows, storage=storage, dtype='float64')
+
+def growth(times: Dict[int, float]) -> float:
+  "Pendiente de `log(tiempo)` frente a `log(n)` por mínimos cuadrados: el exponente empírico"
+  xs = [math.log(n) for n in times]
+  ys = [math.log(t) for t in times.values()]
+  mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+  return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+def linalg_scaling(sizes: Sequence[int], storage: str = 'array') -> Dict[str, Dict[int, float]]:
+  "Tiempos de cada operación de `LINALG` por tamaño"
+  results: Dict[str, Dict[int, float]] = {name: {} for name in LINALG}
+  for n in sizes:
+    a, b = spd_matrix(n, storage), random_matrix(n, storage, seed=2)
+    for name, op in LINALG.items():
+      results[name][n] = best_time(lambda: op(a, b))
+  return results
+
+def reuse(n: int, rhs: int, storage: str = 'array') -> Dict[str, float]:
+  "Resolver `rhs` sistemas refactorizando cada vez o reutilizando una sola `LU`"
+  a = spd_matrix(n, storage)
+  bs = [random_matrix(n, storage, seed=i).col(0) for i in range(rhs)]
+  def reused():
+    factor = a.lu()
+    for b in bs: factor.solve(b)
+  return {
+    'refactor': best_time(lambda: [a.solve(b) for b in bs]),
+    'reuse':    best_time(reused),
+  }
+#endregion
+
+def _run_linalg(sizes: Sequence[int]) -> None:
+  results = linalg_scaling(sizes)
+  print(f"{'n':>5} " + " ".join(f"{name:>10}" for name in LINALG))
+  for n in sizes:
+    print(f"{n:>5} " + " ".join(f"{results[name][n] * 1e3:>8.2f}ms" for name in LINALG))
+  print("exponente " + " ".join(f"{name}={growth(times):.2f}" for name, times in results.items()))
+  n = sizes[-1]
+  times = reuse(n, 10)
+  print(f"10 sistemas n={n}: " + " ".join(f"{key}={elapsed * 1e3:.2f}ms" for key, elapsed in times.items()))
+
+def _run_suite(args: argparse.Namespace) -> int:
+  results = suite(args.sizes, args.dtypes, args.backends, args.operations, args.min_time)
+  report(results)
+  if args.output:
+    save(results, args.output)
+  if args.baseline:
+    regressions = compare(results, load(args.baseline), args.threshold)
+    for entry in regressions:
+      print(f"REGRESSION {entry['operation']} {entry['storage']} {entry['dtype']} n={entry['n']}: "
+            f"ops/s {entry['speed_change']:+.1%}, memory {entry['memory_change']:+.1%}")
+    return 1 if regressions else 0
+  return 0
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmarks de Matrix")
+  parser.add_argument('--suite', action='store_true', help="batería completa con JSON y línea base")
+  parser.add_argument('--linalg', action='store_true', help="factorizaciones y su orden de crecimiento")
+  parser.add_argument('--sizes', type=int, nargs='+', default=[8, 32, 128])
+  parser.add_argument('--dtypes', nargs='+', default=['int64', 'float64'])
+  parser.add_argument('--backends', nargs='+', default=None)
+  parser.add_argument('--operations', nargs='+', default=None, choices=list(SUITE_OPERATIONS))
+  parser.add_argument('--min-time', type=float, default=0.2, help="segundos por ronda de medida")
+  parser.add_argument('--output', help="fichero JSON donde guardar los resultados")
+  parser.add_argument('--baseline', help="fichero JSON con la línea base a comparar")
+  parser.add_argument('--threshold', type=float, default=0.1, help="regresión tolerada (0.1 = 10 %%)")
+  args = parser.parse_args()
+  if args.suite:
+    sys.exit(_run_suite(args))
+  if args.linalg:
+    _run_linalg(args.sizes)
+    sys.exit(0)
+
+  sizes = [2, 4, 8, 16, 32, 64, 128]
+  backends = available_backends()
+  for operation in OPERATIONS:
+    results = sweep(operation, sizes, backends)
+    print(f"== {operation} ==")
+    print(f"{'n':>5} " + " ".join(f"{name:>12}" for name in backends))
+    for n in sizes:
+      print(f"{n:>5} " + " ".join(f"{results[name][n] * 1e3:>10.3f}ms" for name in backends))
+    if 'numpy' in results:
+      print(f"numpy supera a list desde n={crossover(results, 'numpy', 'list')}")
+
+  print("== iteración (n=300) ==")
+  for name in backends:
+    times = iteration(300, name)
+    print(f"{name:>6} " + " ".join(f"{key}={elapsed * 1e3:.2f}ms" for key, elapsed in times.items()))
@@ -0,0 +1,179 @@
+"""Expresiones perezosas sobre `Matrix`.
+
+`A.lazy() + B + C` o `A.lazy() * B + C` no calculan nada: construyen un árbol
+que `evaluate()` recorre fila a fila en una sola pasada, escribiendo cada fila
+del resultado una única vez (en una matriz nueva o en `out`). No se crean
+matrices intermedias: la fila `i` se calcula componiendo `map` sobre las filas
+`i` de los operandos. En un producto la fila `i` es la fila `i` del operando
+izquierdo por el derecho, que se evalúa y traspone una sola vez.
+"""
+from itertools import repeat
+from numbers import Number
+from operator import add, sub, mul
+from typing import Any, Callable, Iterable, Optional, Tuple, Union
+
+from storage import Storage, ViewStorage, promote, resolve_dtype
+from kernels import transpose
+
+RowFn = Callable[[int], Iterable[Any]]
+
+
+def _rsub(a: Any, b: Any) -> Any:
+  return b - a
+
+# nombre de cada operación en los mensajes de error
+_NOUNS = {add: "addition", sub: "subtraction", _rsub: "subtraction", mul: "multiplication"}
+
+def _scalar_dtype(value: Any) -> Optional[str]:
+  return resolve_dtype(type(value))
+
+
+class Expr:
+  "Nodo de una expresión perezosa"
+  shape: Tuple[int, int]
+  dtype: Optional[str]
+
+  def leaves(self) -> Iterable["Leaf"]:
+    raise NotImplementedError
+
+  def row_fn(self) -> RowFn:
+    "Función `i -> fila i` del resultado (un iterable que se consume una vez)"
+    raise NotImplementedError
+
+  def __add__(self, other: Any) -> "Expr":
+    return Elementwise(add, self, other)
+
+  __radd__ = __add__
+
+  def __sub__(self, other: Any) -> "Expr":
+    return Elementwise(sub, self, other)
+
+  def __rsub__(self, other: Any) -> "Expr":
+    return Elementwise(_rsub, self, other)
+
+  def __mul__(self, other: Any) -> "Expr":
+    if isinstance(other, Number):
+      return Elementwise(mul, self, other)
+    return MatMul(self, as_expr(other))
+
+  def __rmul__(self, other: Any) -> "Expr":
+    if isinstance(other, Number):
+      return Elementwise(mul, self, other)
+    return MatMul(as_expr(other), self)
+
+  def evaluate(self, out: Any = None) -> Any:
+    """Calcula la expresión en una sola pasada.
+    Con `out` (una `Matrix` de la misma forma) el resultado se escribe en ella y no se reserva memoria nueva;
+    su dtype debe poder contener el del resultado (p. ej. no `int64` para `A + 0.5`).
+    """
+    leaves = list(self.leaves())
+    if out is None:
+      base = leaves[0].matrix
+      storage = base._storage.backend.from_rows(_rows(self), self.shape[1], self.dtype)
+      return type(base)._wrap(storage)
+
+    if out.shape != self.shape:
+      raise ValueError("Output matrix must have the same dimensions as the expression.")
+    if out.dtype is not None and promote(self.dtype, out.dtype) not in (None, out.dtype):
+      # `out` conserva su dtype: escribir el resultado truncaría o fallaría a mitad
+      raise ValueError(f"Output matrix dtype {out.dtype} cannot hold the expression result ({self.dtype}).")
+    target = out._writable()
+    for leaf in leaves:
+      # una vista del propio `out` cambiaría mientras se escribe
+      if isinstance(leaf.storage, ViewStorage) and leaf.storage.base is target:
+        leaf.storage = leaf.storage.materialize()
+    row = self.row_fn()
+    for i in range(self.shape[0]):
+      target.set_row(i, row(i))
+    return out
+
+  def __str__(self) -> str:
+    return str(self.evaluate())
+
+
+class Leaf(Expr):
+  "Matriz de la expresión"
+
+  def __init__(self, matrix: Any) -> None:
+    self.matrix = matrix
+    self.storage: Storage = matrix._storage
+    self.shape = matrix.shape
+    self.dtype = matrix.dtype
+
+  def leaves(self):
+    yield self
+
+  def row_fn(self):
+    return self.storage.row
+
+
+class Elementwise(Expr):
+  "Operación elemento a elemento entre dos expresiones o una expresión y un escalar"
+
+  def __init__(self, op: Callable[[Any, Any], Any], left: Expr, right: Any) -> None:
+    if not isinstance(right, Number):
+      right = as_expr(right)
+      if left.shape != right.shape:
+        raise ValueError(f"Matrices must have the same dimensions for {_NOUNS.get(op, 'elementwise operations')}.")
+      self.dtype = promote(left.dtype, right.dtype)
+    else:
+      self.dtype = promote(left.dtype, _scalar_dtype(right))
+    self.op = op
+    self.left = left
+    self.right = right
+    self.shape = left.shape
+
+  def leaves(self):
+    yield from self.left.leaves()
+    if isinstance(self.right, Expr):
+      yield from self.right.leaves()
+
+  def row_fn(self):
+    op, left = self.op, self.left.row_fn()
+    if isinstance(self.right, Expr):
+      right = self.right.row_fn()
+      return lambda i: map(op, left(i), right(i))
+    scalar = self.right
+    return lambda i: map(op, left(i), repeat(scalar))
+
+
+class MatMul(Expr):
+  "Producto matricial; el operando derecho se materializa y se traspone una vez"
+
+  def __init__(self, left: Expr, right: Expr) -> None:
+    if left.shape[1] != right.shape[0]:
+      raise ValueError("Number of columns in the first matrix must equal number of rows in the second matrix.")
+    self.left = left
+    self.right = right
+    self.shape = (left.shape[0], right.shape[1])
+    self.dtype = promote(left.dtype, right.dtype)
+
+  def leaves(self):
+    yield from self.left.leaves()
+    yield from self.right.leaves()
+
+  def row_fn(self):
+    right = self.right
+    rows = right.storage.iter_rows() if isinstance(right, Leaf) else _rows(right)
+    bt = transpose(list(rows), self.shape[1])
+    left = self.left.row_fn()
+    def row(i: int) -> Iterable[Any]:
+      a_row = list(left(i))
+      return (sum(map(mul, a_row, b_col)) for b_col in bt)
+    return row
+
+
+def _rows(expr: Expr) -> Iterable[Iterable[Any]]:
+  row = expr.row_fn()
+  return (row(i) for i in range(expr.shape[0]))
+
+def as_expr(value: Any) -> Expr:
+  "Convierte una `Matrix` en hoja; las expresiones se devuelven tal cual"
+  if isinstance(value, Expr):
+    return value
+  if hasattr(value, '_storage'):
+    return Leaf(value)
+  raise ValueError("Can only operate with a Matrix, an expression or a scalar.")
+
+def evaluate(expr: Union[Expr, Any], out: Any = None) -> Any:
+  return as_expr(expr).evaluate(out)
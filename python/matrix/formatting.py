@@ -0,0 +1,76 @@
+"""Representación de `Matrix` como texto.
+
+Cada celda se convierte con `str` una sola vez. Por encima de `THRESHOLD`
+celdas se resume al estilo de NumPy: solo se muestran las `EDGE_ITEMS`
+primeras y últimas filas y columnas, con `...` en lugar del resto, así que
+imprimir una matriz enorme cuesta lo mismo que imprimir una pequeña.
+`write_to` vuelca la matriz completa a un fichero fila a fila sin construir
+la cadena entera en memoria.
+"""
+from itertools import chain
+from typing import Iterable, List, Optional, Sequence, TextIO
+
+from storage import Storage
+
+# Número de celdas a partir del cual `__str__` resume la matriz
+THRESHOLD = 1000
+# Filas y columnas que se muestran en cada extremo al resumir
+EDGE_ITEMS = 3
+ELLIPSIS = '...'
+
+
+def _edges(n: int, edgeitems: int) -> Optional[List[int]]:
+  "Índices de los extremos, o `None` si caben todos"
+  if n <= 2 * edgeitems:
+    return None
+  return list(chain(range(edgeitems), range(n - edgeitems, n)))
+
+def _format(cells: Sequence[List[str]], width: int) -> Iterable[str]:
+  for row in cells:
+    yield "[ " + " ".join(cell.rjust(width) for cell in row) + " ]"
+
+def _summary(storage: Storage, edgeitems: int) -> str:
+  row_idx = _edges(storage.rows, edgeitems) or range(storage.rows)
+  col_idx = _edges(storage.cols, edgeitems)
+  if col_idx is None:
+    cells = [list(map(str, storage.row(i))) for i in row_idx]
+  else:
+    cells = [[str(storage.get(i, j)) for j in col_idx] for i in row_idx]
+  width = max(len(cell) for cell in chain.from_iterable(cells))
+  if col_idx is not None:
+    for row in cells:
+      row.insert(edgeitems, ELLIPSIS.rjust(width))
+  lines = list(_format(cells, width))
+  if len(row_idx) < storage.rows:
+    lines.insert(edgeitems, ELLIPSIS)
+  return "\n".join(lines)
+
+def render(storage: Storage, threshold: Optional[int] = None, edgeitems: Optional[int] = None) -> str:
+  "Texto de la matriz; la resume si tiene más de `threshold` celdas"
+  threshold = THRESHOLD if threshold is None else threshold
+  edgeitems = EDGE_ITEMS if edgeitems is None else edgeitems
+  if not storage.rows or not storage.cols:
+    return "[]"
+  if storage.rows * storage.cols > threshold:
+    return _summary(storage, edgeitems)
+  cells = [list(map(str, row)) for row in storage.iter_row_lists()]
+  width = max(len(cell) for cell in chain.from_iterable(cells))
+  return "\n".join(_format(cells, width))
+
+def _width(storage: Storage) -> int:
+  "Ancho de la celda más larga; para enteros basta con el mínimo y el máximo"
+  if storage.dtype is not None and storage.dtype.startswith('int'):
+    return max(len(str(min(storage.iter_values()))), len(str(max(storage.iter_values()))))
+  return max(len(str(value)) for value in storage.iter_values())
+
+def write_to(storage: Storage, file: TextIO, align: bool = True) -> None:
+  """Escribe la matriz completa en `file` fila a fila.
+  Con `align=False` cada celda se convierte una sola vez; con `align=True` se
+  calcula antes el ancho común (para enteros, sin convertir cada celda).
+  """
+  if not storage.rows or not storage.cols:
+    file.write("[]\n")
+    return
+  width = _width(storage) if align else 0
+  for row in storage.iter_row_lists():
+    file.write("[ " + " ".join(str(value).rjust(width) for value in row) + " ]\n")
@@ -0,0 +1,105 @@
+from operator import add, sub, mul
+from typing import Any, List, Optional, Sequence
+
+Rows = List[List[Any]]
+
+# Tamaño de los bloques (tiles) de la multiplicación
+BLOCK_SIZE: int = 64
+# Dimensión a partir de la cual se usa Strassen (`None` lo desactiva)
+STRASSEN_THRESHOLD: Optional[int] = None
+
+
+def transpose(rows: Sequence[Sequence[Any]], cols: int) -> Rows:
+  if not rows: return [[] for _ in range(cols)]
+  return [list(col) for col in zip(*rows)]
+
+def matmul_blocked(a: Sequence[Sequence[Any]], b: Sequence[Sequence[Any]], cols: int, block_size: Optional[int] = None) -> Rows:
+  """Multiplicación por bloques con el operando derecho traspuesto.
+
+  Las columnas de `b` se convierten en filas contiguas y cada bloque de `a` y `bt`
+  se recorta una sola vez, de modo que el producto escalar interno recorre dos
+  secuencias contiguas con `map` en lugar de un generador sobre `b[k][j]`.
+  El orden de suma solo cambia para flotantes; con enteros el resultado es idéntico.
+  """
+  return matmul_transposed(a, transpose(b, cols), block_size)
+
+def matmul_transposed(a: Sequence[Sequence[Any]], bt: Sequence[Sequence[Any]], block_size: Optional[int] = None) -> Rows:
+  "Núcleo de `matmul_blocked` con el operando derecho ya traspuesto (`bt[j]` es la columna `j`)"
+  block = block_size or BLOCK_SIZE
+  n, cols = len(a), len(bt)
+  inner = len(bt[0]) if bt else 0
+  result = [[0] * cols for _ in range(n)]
+
+  for kk in range(0, inner, block):
+    k_end = min(kk + block, inner)
+    a_seg = [row[kk:k_end] for row in a]
+    bt_seg = [col[kk:k_end] for col in bt]
+    for ii in range(0, n, block):
+      for jj in range(0, cols, block):
+        b_block = bt_seg[jj:jj + block]
+        for i in range(ii, min(ii + block, n)):
+          a_row = a_seg[i]
+          out = result[i]
+          j = jj
+          for b_col in b_block:
+            acc = out[j]
+            acc += sum(map(mul, a_row, b_col))
+            out[j] = acc
+            j += 1
+  return result
+
+#region: Strassen
+def _madd(x: Rows, y: Rows) -> Rows:
+  return [list(map(add, r, s)) for r, s in zip(x, y)]
+
+def _msub(x: Rows, y: Rows) -> Rows:
+  return [list(map(sub, r, s)) for r, s in zip(x, y)]
+
+def _pad(rows: Sequence[Sequence[Any]], n: int, m: int) -> Rows:
+  padded = [list(row) + [0] * (m - len(row)) for row in rows]
+  padded.extend([0] * m for _ in range(n - len(padded)))
+  return padded
+
+def matmul_strassen(a: Sequence[Sequence[Any]], b: Sequence[Sequence[Any]], cols: int, threshold: int, block_size: Optional[int] = None) -> Rows:
+  """Multiplicación de Strassen: 7 productos recursivos en lugar de 8.
+  Por debajo de `threshold` (en cualquier dimensión) usa `matmul_blocked`.
+  Las dimensiones impares se rellenan con ceros y se recortan al final.
+  """
+  n, inner = len(a), len(b)
+  if min(n, inner, cols) <= max(threshold, 1):
+    return matmul_blocked(a, b, cols, block_size)
+
+  n2, k2, m2 = n + n % 2, inner + inner % 2, cols + cols % 2
+  a, b = _pad(a, n2, k2), _pad(b, k2, m2)
+  h, kh, mh = n2 // 2, k2 // 2, m2 // 2
+
+  a11, a12 = [r[:kh] for r in a[:h]], [r[kh:] for r in a[:h]]
+  a21, a22 = [r[:kh] for r in a[h:]], [r[kh:] for r in a[h:]]
+  b11, b12 = [r[:mh] for r in b[:kh]], [r[mh:] for r in b[:kh]]
+  b21, b22 = [r[:mh] for r in b[kh:]], [r[mh:] for r in b[kh:]]
+
+  rec = lambda x, y: matmul_strassen(x, y, mh, threshold, block_size)
+  m1 = rec(_madd(a11, a22), _madd(b11, b22))
+  m2 = rec(_madd(a21, a22), b11)
+  m3 = rec(a11, _msub(b12, b22))
+  m4 = rec(a22, _msub(b21, b11))
+  m5 = rec(_madd(a11, a12), b22)
+  m6 = rec(_msub(a21, a11), _madd(b11, b12))
+  m7 = rec(_msub(a12, a22), _madd(b21, b22))
+
+  c11 = _madd(_msub(_madd(m1, m4), m5), m7)
+  c12 = _madd(m3, m5)
+  c21 = _madd(m2, m4)
+  c22 = _madd(_madd(_msub(m1, m2), m3), m6)
+
+  top = [r + s for r, s in zip(c11, c12)]
+  bottom = [r + s for r, s in zip(c21, c22)]
+  return [row[:cols] for row in (top + bottom)[:n]]
+#endregion
+
+def matmul(a: Sequence[Sequence[Any]], b: Sequence[Sequence[Any]], cols: int, block_size: Optional[int] = None, strassen_threshold: Optional[int] = None) -> Rows:
+  "Producto `a x b` (`b` con `cols` columnas) eligiendo el algoritmo según el tamaño"
+  threshold = strassen_threshold if strassen_threshold is not None else STRASSEN_THRESHOLD
+  if threshold is not None:
+    return matmul_strassen(a, b, cols, threshold, block_size)
+  return matmul_blocked(a, b, cols, block_size)
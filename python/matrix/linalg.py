@@ -0,0 +1,156 @@
+"""Factorizaciones y sistemas lineales sobre `Matrix`.
+
+Las factorizaciones trabajan sobre un `array('d')` plano en orden row-major:
+una copia de la matriz o, con `overwrite=True` sobre una matriz `'array'` de
+`float64`, el propio buffer de la matriz (sin reservar memoria nueva).
+
+- `LU`: `PA = LU` con pivoteo parcial. Los intercambios de filas no mueven
+  datos: se guarda la permutación `perm` y la fila lógica `i` es la fila
+  física `perm[i]`. `L` (diagonal unitaria) y `U` comparten el buffer.
+- `Cholesky`: `A = L Lᵀ` para matrices simétricas definidas positivas; solo
+  se lee el triángulo inferior.
+
+Factorizar cuesta O(n³) y cada `solve` posterior O(n²) por columna, así que
+para varios lados derechos conviene factorizar una vez y reutilizar el objeto:
+
+  factor = A.lu()
+  x1, x2 = factor.solve(b1), factor.solve(b2)
+"""
+from array import array
+from itertools import repeat
+from math import sqrt, prod
+from operator import mul, sub
+from typing import Any, List
+
+from storage import ArrayStorage, Storage
+
+
+def _buffer(storage: Storage, overwrite: bool) -> array:
+  "Buffer `float64` a factorizar: el de la matriz si se puede sobrescribir o una copia"
+  if storage.rows != storage.cols:
+    raise ValueError("Matrix must be square.")
+  if overwrite:
+    if type(storage) is not ArrayStorage or storage.dtype != 'float64':
+      raise ValueError("overwrite=True requires an 'array' storage with dtype float64.")
+    return storage.buf
+  return array('d', storage.flat())
+
+def _columns(storage: Storage, n: int) -> List[List[float]]:
+  if storage.rows != n:
+    raise ValueError("Right-hand side must have as many rows as the matrix.")
+  return [list(map(float, col)) for col in zip(*storage.iter_rows())] if n else []
+
+
+class _Factorization:
+  "Base de las factorizaciones: resolución columna a columna e inversa"
+
+  def __init__(self, matrix: Any, overwrite: bool = False) -> None:
+    self._wrap = type(matrix)._wrap
+    self._backend = matrix._storage.backend
+    self.n = matrix._storage.rows
+    self.buf = _buffer(matrix._storage, overwrite)
+
+  def _solve_vector(self, b: List[float]) -> List[float]:
+    raise NotImplementedError
+
+  def _result(self, columns: List[List[float]], cols: int) -> Any:
+    return self._wrap(self._backend.from_rows(zip(*columns) if columns else [[]] * self.n, cols, 'float64'))
+
+  def solve(self, b: Any) -> Any:
+    "Solución de `A x = b` para una `Matrix` `b` de `n x m` (cada columna es un lado derecho)"
+    columns = _columns(b._storage, self.n)
+    return self._result([self._solve_vector(col) for col in columns], b._storage.cols)
+
+  def inverse(self) -> Any:
+    n = self.n
+    identity = ([0.0] * i + [1.0] + [0.0] * (n - i - 1) for i in range(n))
+    return self._result([self._solve_vector(col) for col in identity], n)
+
+  def det(self) -> float:
+    raise NotImplementedError
+
+
+class LU(_Factorization):
+  "Factorización `PA = LU` con pivoteo parcial"
+
+  def __init__(self, matrix: Any, overwrite: bool = False) -> None:
+    super().__init__(matrix, overwrite)
+    n, a = self.n, self.buf
+    perm = list(range(n))
+    self.sign = 1
+    self.singular = False
+    for k in range(n):
+      p = max(range(k, n), key=lambda i: abs(a[perm[i] * n + k]))
+      if a[perm[p] * n + k] == 0:
+        self.singular = True
+        continue
+      if p != k:
+        perm[k], perm[p] = perm[p], perm[k]
+        self.sign = -self.sign
+      rk = perm[k] * n
+      pivot = a[rk + k]
+      tail = a[rk + k + 1:rk + n]
+      for i in range(k + 1, n):
+        ri = perm[i] * n
+        factor = a[ri + k] / pivot
+        a[ri + k] = factor
+        if factor:
+          a[ri + k + 1:ri + n] = array('d', map(sub, a[ri + k + 1:ri + n], map(mul, repeat(factor), tail)))
+    self.perm = perm
+
+  def _solve_vector(self, b):
+    if self.singular:
+      raise ValueError("Matrix is singular.")
+    n, a, perm = self.n, self.buf, self.perm
+    y: List[float] = []
+    for i in range(n):
+      ri = perm[i] * n
+      y.append(b[perm[i]] - sum(map(mul, a[ri:ri + i], y)))
+    x = [0.0] * n
+    for i in reversed(range(n)):
+      ri = perm[i] * n
+      x[i] = (y[i] - sum(map(mul, a[ri + i + 1:ri + n], x[i + 1:]))) / a[ri + i]
+    return x
+
+  def det(self):
+    if self.singular:
+      return 0.0
+    n, a = self.n, self.buf
+    return self.sign * prod(a[p * n + i] for i, p in enumerate(self.perm))
+
+
+class Cholesky(_Factorization):
+  "Factorización `A = L Lᵀ`; el triángulo superior del buffer queda a cero"
+
+  def __init__(self, matrix: Any, overwrite: bool = False) -> None:
+    super().__init__(matrix, overwrite)
+    n, a = self.n, self.buf
+    for i in range(n):
+      ri = i * n
+      for j in range(i + 1):
+        rj = j * n
+        s = sum(map(mul, a[ri:ri + j], a[rj:rj + j]))
+        if i == j:
+          d = a[ri + i] - s
+          if d <= 0:
+            raise ValueError("Matrix is not positive definite.")
+          a[ri + i] = sqrt(d)
+        else:
+          a[ri + j] = (a[ri + j] - s) / a[rj + j]
+      a[ri + i + 1:ri + n] = array('d', bytes(8 * (n - i - 1)))
+
+  def _solve_vector(self, b):
+    n, a = self.n, self.buf
+    y: List[float] = []
+    for i in range(n):
+      ri = i * n
+      y.append((b[i] - sum(map(mul, a[ri:ri + i], y))) / a[ri + i])
+    x = [0.0] * n
+    for i in reversed(range(n)):
+      # columna `i` de L por debajo de la diagonal = fila `i` de Lᵀ
+      x[i] = (y[i] - sum(map(mul, a[(i + 1) * n + i::n], x[i + 1:]))) / a[i * n + i]
+    return x
+
+  def det(self):
+    n, a = self.n, self.buf
+    return prod(a[i * n + i] for i in range(n)) ** 2
@@ -25,3 +25,19 @@ if __name__ == "__main__":
   
   n_matrix1._1_1 = 1234.4321
   print(n_matrix1)
+  
+  # almacenamiento contiguo y tipado
+  matrix3 = Matrix([[1, 2], [3, 4]], storage='array', dtype=int)
+  print(matrix3.storage, matrix3.dtype)
+  print(matrix3 * matrix3)
+  print(matrix3.as_type(float).dtype)
+  
+  # expresiones perezosas: una sola pasada y una sola reserva de memoria
+  result = (matrix1.lazy() * matrix1 + matrix1).evaluate()
+  print(result)
+  
+  # potencias por cuadrados: F(n) es el elemento (0, 1) de [[1, 1], [1, 0]]**n
+  fib = Matrix([[1, 1], [1, 0]])
+  print([(fib ** n)[0, 1] for n in range(10)])
+  # con `cache=True` los cuadrados se reutilizan entre llamadas mientras `fib` no cambie
+  print([fib.power(n, cache=True)[0, 1] for n in range(10, 15)])
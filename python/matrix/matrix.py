@@ -1,112 +1,503 @@
-from copy import deepcopy
-from typing import List,Any,Tuple
+from collections import OrderedDict
+from numbers import Number
+from operator import add, sub, mul
+from itertools import product
+from typing import List,Any,Tuple,Iterator,Optional,TextIO
+
+from storage import Storage, ListStorage, ViewStorage, BroadcastStorage, get_backend, resolve_dtype, infer_dtype, promote, pytype, broadcast_shape
+import numpy_backend
+import serialization
+import outofcore
+import formatting
+import linalg
+from expr import Expr, Leaf
+
+#region: Acceso `_i_j`
+# nombre de atributo -> (i, j, admite asignación) o None si no es una celda, en orden LRU
+_CELLS: "OrderedDict[str, Optional[Tuple[int,int,bool]]]" = OrderedDict()
+# unas 10 MB como mucho: los nombres de una matriz de 256 x 256
+_CELLS_MAX_SIZE = 1 << 16
+_UNPARSED = object()
+
+def _cell(name:str) -> Optional[Tuple[int,int,bool]]:
+  """Interpreta (una sola vez) un nombre como `_i_j`.
+  La lectura acepta cualquier entero; la asignación solo dígitos, como antes.
+  """
+  cell = _CELLS.get(name, _UNPARSED)
+  if cell is not _UNPARSED:
+    _CELLS.move_to_end(name)
+    return cell
+  cell = None
+  if name.startswith('_'):
+    parts = name[1:].split('_')
+    if len(parts) == 2:
+      try:
+        i, j = map(int, parts)
+        cell = (i, j, name[1:].replace('_', '').isdigit())
+      except ValueError:
+        pass
+  _CELLS[name] = cell
+  if len(_CELLS) > _CELLS_MAX_SIZE:
+    # descarta solo el nombre usado hace más tiempo
+    _CELLS.popitem(last=False)
+  return cell
+#endregion
 
 class Matrix:
+  is_sparse = False
+  # Se incrementa con cada escritura; invalida la caché de potencias
+  _version = 0
+  _powers: Optional[Tuple[int, List["Matrix"]]] = None
   
   def __init__(self, *args:tuple[Any], **kwargs:dict[str,int]) -> None:
+    """Crea una matriz a partir de una lista de filas o de `rows`, `cols` y `default`.
+    
+    - `storage`: motor de almacenamiento (`'list'` por defecto, `'array'` contiguo y tipado o `'numpy'` si está instalado)
+    - `dtype`: tipo de los elementos (`'int64'`, `'float64'`, `int`, `float`, ...)
+    """
+    backend = get_backend(kwargs.get('storage', 'list'))
+    dtype = resolve_dtype(kwargs.get('dtype'))
+    
     if len(args) == 1 and isinstance(args[0], list):
-      self.data:List[List[Any]] = args[0]
+      if backend is ListStorage and dtype is None:
+        self._storage:Storage = ListStorage(args[0])
+      else:
+        cols = len(args[0][0]) if args[0] else 0
+        if backend is not ListStorage and dtype is None:
+          dtype = infer_dtype(args[0])
+        self._storage = backend.from_rows(args[0], cols, dtype)
       return 
     
     if 'rows' in kwargs and 'cols' in kwargs:
-      if 'default' in kwargs:
-        default_value = kwargs['default']
+      default_value = kwargs.get('default', 0)
       rows:int = kwargs.get('rows', -1)
       cols:int = kwargs.get('cols', -1) 
-      self.data = [[default_value for _ in range(cols)] for _ in range(rows)]
+      self._storage = backend.filled(rows, cols, default_value, dtype)
       return
+  
+  @classmethod
+  def _wrap(cls, storage:Storage) -> "Matrix":
+    matrix = cls.__new__(cls)
+    matrix._storage = storage
+    return matrix
+  
+  @classmethod
+  def from_numpy(cls, arr, storage:str='numpy') -> "Matrix":
+    "Crea una matriz a partir de un `ndarray` (sin copia con `storage='numpy'`)"
+    return cls._wrap(numpy_backend.from_ndarray(arr, storage))
+  
+  def to_numpy(self):
+    "Devuelve los datos como `ndarray` (sin copia con los motores `'numpy'` y `'array'`)"
+    return numpy_backend.to_ndarray(self._storage)
+  
+  def save(self, path:str) -> None:
+    "Guarda la matriz en el formato binario de `serialization` (cabecera + valores little-endian)"
+    serialization.save(self._storage, path)
+  
+  @classmethod
+  def load(cls, path:str, mmap:bool=False, mode:str='r') -> "Matrix":
+    """Carga una matriz guardada con `save`.
+    Con `mmap=True` el fichero se proyecta en memoria y solo se leen las páginas que se usan;
+    `mode` puede ser `'r'`, `'r+'` (escribe en el fichero) o `'c'` (copy-on-write).
+    """
+    return cls._wrap(serialization.load(path, mmap, mode))
+  
+  @property
+  def data(self) -> List[List[Any]]:
+    "Filas de la matriz. Solo con `storage='list'` es la lista interna; en otro caso es una copia"
+    return self._storage.to_lists()
+  
+  @data.setter
+  def data(self, value:List[List[Any]]) -> None:
+    self._storage = ListStorage(value)
+    self._version += 1
+  
+  @property
+  def shape(self) -> Tuple[int,int]:
+    return (self._storage.rows, self._storage.cols)
+  
+  @property
+  def dtype(self):
+    return self._storage.dtype
+  
+  @property
+  def storage(self) -> str:
+    return self._storage.backend.kind
+  
+  @property
+  def is_view(self) -> bool:
+    return self._storage.shared
+  
+  def _operands(self, other:"Matrix") -> Tuple[Storage,Storage]:
+    "Almacenamientos de `self` y `other` en el mismo motor (el de `self`), listos para operar"
+    storage = self._storage.materialize()
+    other_storage = other._storage
+    if type(other_storage) is not type(storage):
+      other_storage = type(storage).convert(other_storage)
+    return storage, other_storage
+  
+  def _writable(self) -> Storage:
+    """Almacenamiento propio para escribir: las vistas se copian la primera vez (copy-on-write)
+    y los ficheros proyectados en solo lectura se copian a memoria.
+    """
+    self._version += 1
+    if self._storage.shared:
+      self._storage = self._storage.materialize()
+    elif self._storage.readonly:
+      self._storage = self._storage.copy()
+    return self._storage
     
   def __str__(self):
-    if not self.data:
-      return "[]"
-    max_len = max(len(str(item)) for row in self.data for item in row)
-    rows_str = []
-    for row in self.data:
-      row_str = " ".join(f"{str(item):>{max_len}}" for item in row)
-      rows_str.append(f"[ {row_str} ]")
-    return "\n".join(rows_str)
+    return formatting.render(self._storage)
+
+  def write_to(self, file:TextIO, align:bool=True) -> None:
+    "Vuelca la matriz completa en `file` (abierto en modo texto) fila a fila"
+    formatting.write_to(self._storage, file, align)
   
-  def __add__(self, other:"Matrix") -> "Matrix":
+  def _defers(self, other) -> bool:
+    "Operandos que implementan la operación con `Matrix` (dispersas y expresiones perezosas)"
+    return getattr(other, 'is_sparse', False) or isinstance(other, Expr)
+  
+  def _elementwise(self, op, other, verb:str, noun:str) -> "Matrix":
+    storage = self._storage.materialize()
+    if isinstance(other, Number):
+      dtype = promote(storage.dtype, resolve_dtype(type(other)))
+      return Matrix._wrap(storage.elementwise(op, other, dtype))
+    
     if not isinstance(other, Matrix):
-      raise ValueError("Can only add another Matrix.")
+      raise ValueError(f"Can only {verb} another Matrix.")
+    
+    # una fila (`1 x n`) o una columna (`n x 1`) se repite hasta la forma del otro operando
+    shape = broadcast_shape(self.shape, other.shape)
+    if shape is None:
+      raise ValueError(f"Matrices must have the same dimensions for {noun}.")
     
-    if len(self.data) != len(other.data) or len(self.data[0]) != len(other.data[0]):
-      raise ValueError("Matrices must have the same dimensions for addition.")
+    if self.shape == other.shape and outofcore.use_out_of_core(self.shape, self._storage, other._storage):
+      return Matrix._wrap(outofcore.run_elementwise(op, self._storage, other._storage))
+    
+    storage, other_storage = self._operands(other)
+    if self.shape != shape:
+      storage = BroadcastStorage(storage, *shape).materialize()
+    if other.shape != shape:
+      other_storage = BroadcastStorage(other_storage, *shape)
+    dtype = promote(storage.dtype, other_storage.dtype)
+    return Matrix._wrap(storage.elementwise(op, other_storage, dtype))
+  
+  def _ielementwise(self, op, other, verb:str, noun:str) -> "Matrix":
+    if isinstance(other, Number):
+      other_dtype = resolve_dtype(type(other))
+    elif isinstance(other, Matrix):
+      other_dtype = other._storage.dtype
+    else:
+      raise ValueError(f"Can only {verb} another Matrix.")
     
-    result = []
-    for i in range(len(self.data)):
-      row = [self.data[i][j] + other.data[i][j] for j in range(len(self.data[0]))]
-      result.append(row)
+    dtype = self._storage.dtype
+    if dtype is not None and promote(dtype, other_dtype) not in (None, dtype):
+      # el resultado no cabe en el dtype actual (p. ej. `int64 += 1.5`): como con
+      # `a + b`, se promociona y el almacenamiento se sustituye por el resultado
+      self._storage = self._elementwise(op, other, verb, noun)._storage
+      self._version += 1
+      return self
     
-    return Matrix(result)
+    if isinstance(other, Number):
+      self._writable().ielementwise(op, other)
+      return self
+    
+    if broadcast_shape(self.shape, other.shape) != self.shape:
+      raise ValueError(f"Matrices must have the same dimensions for {noun}.")
+    
+    target = self._writable()
+    # una vista podría apuntar a los valores que se están sobrescribiendo
+    other_storage = other._storage.materialize()
+    if type(other_storage) is not type(target):
+      other_storage = type(target).convert(other_storage)
+    if other.shape != self.shape:
+      other_storage = BroadcastStorage(other_storage, *self.shape)
+    target.ielementwise(op, other_storage)
+    return self
+  
+  def __add__(self, other:"Matrix") -> "Matrix":
+    if self._defers(other):
+      return NotImplemented
+    return self._elementwise(add, other, "add", "addition")
+  
+  def __radd__(self, other) -> "Matrix":
+    if not isinstance(other, Number):
+      return NotImplemented
+    return self._elementwise(add, other, "add", "addition")
+  
+  def __iadd__(self, other) -> "Matrix":
+    if self._defers(other):
+      return NotImplemented
+    return self._ielementwise(add, other, "add", "addition")
+  
+  def __sub__(self, other) -> "Matrix":
+    if self._defers(other):
+      return NotImplemented
+    return self._elementwise(sub, other, "subtract", "subtraction")
+  
+  def __rsub__(self, other) -> "Matrix":
+    if not isinstance(other, Number):
+      return NotImplemented
+    return (-self)._elementwise(add, other, "add", "addition")
+  
+  def __isub__(self, other) -> "Matrix":
+    if self._defers(other):
+      return NotImplemented
+    return self._ielementwise(sub, other, "subtract", "subtraction")
+  
+  def __neg__(self) -> "Matrix":
+    return self._elementwise(mul, -1, "multiply", "multiplication")
 
   def __mul__(self, other:"Matrix") -> "Matrix":
+    if self._defers(other):
+      return NotImplemented
+    if isinstance(other, Number):
+      return self._elementwise(mul, other, "multiply", "multiplication")
+    return self.matmul(other)
+  
+  def __rmul__(self, other) -> "Matrix":
+    if not isinstance(other, Number):
+      return NotImplemented
+    return self._elementwise(mul, other, "multiply", "multiplication")
+  
+  def __imul__(self, other) -> "Matrix":
+    "Escala en el sitio; el producto matricial reemplaza el almacenamiento por el resultado"
+    if self._defers(other):
+      return NotImplemented
+    if isinstance(other, Number):
+      return self._ielementwise(mul, other, "multiply", "multiplication")
+    self._storage = self.matmul(other)._storage
+    self._version += 1
+    return self
+
+  def _identity(self) -> "Matrix":
+    n = self._storage.rows
+    rows = ([0] * i + [1] + [0] * (n - i - 1) for i in range(n))
+    return Matrix._wrap(self._storage.backend.from_rows(rows, n, self._storage.dtype))
+
+  def _squares(self, count:int, cache:bool) -> List["Matrix"]:
+    "`[A, A², A⁴, ...]` con `count` elementos; con `cache` se guardan mientras la matriz no cambie"
+    squares = [self]
+    if cache and not self.is_view:
+      if self._powers is not None and self._powers[0] == self._version:
+        squares = self._powers[1]
+      else:
+        self._powers = (self._version, squares)
+    while len(squares) < count:
+      squares.append(squares[-1] * squares[-1])
+    return squares
+
+  def power(self, k:int, cache:bool=False) -> "Matrix":
+    """`A**k` por cuadrados sucesivos: O(log k) productos en lugar de k - 1.
+    Con `cache=True` los cuadrados `A^(2^i)` se reutilizan en llamadas posteriores hasta que
+    la matriz se modifica a través de esta `Matrix`. Las escrituras en las listas devueltas por
+    `data` o desde otra `Matrix` que comparta los mismos datos no se detectan, así que solo
+    conviene activarla si la matriz no se modifica por esas vías.
+    Un exponente negativo usa la inversa.
+    """
+    if self._storage.rows != self._storage.cols:
+      raise ValueError("Matrix must be square.")
+    if k < 0:
+      return self.inverse().power(-k)
+    if k == 0:
+      return self._identity()
+    squares = self._squares(k.bit_length(), cache)
+    result = None
+    for i in range(k.bit_length()):
+      if k >> i & 1:
+        result = squares[i] if result is None else result * squares[i]
+    # no se devuelve un objeto de la caché: escribir en él la corrompería
+    return result.copy() if result is squares[k.bit_length() - 1] else result
+
+  def __pow__(self, k) -> "Matrix":
+    "Sin caché de potencias; para reutilizarlas, `power(k, cache=True)`"
+    if not isinstance(k, int):
+      return NotImplemented
+    return self.power(k)
+  
+  def lazy(self) -> Expr:
+    """Hoja de una expresión perezosa: `A.lazy() + B + C` o `A.lazy() * B + C`
+    se evalúan en una sola pasada con `evaluate(out=None)`.
+    """
+    return Leaf(self)
+  
+  def matmul(self, other:"Matrix", block_size:int=None, strassen_threshold:int=None,
+             workers:int=None, min_parallel_size:int=None) -> "Matrix":
+    """Producto matricial con parámetros del kernel.
+    
+    - `block_size`: tamaño de los bloques (por defecto `kernels.BLOCK_SIZE`)
+    - `strassen_threshold`: dimensión a partir de la cual se usa Strassen (por defecto `kernels.STRASSEN_THRESHOLD`)
+    - `workers`: procesos para repartir bandas de filas (por defecto `parallel.WORKERS`; `0` usa todos los núcleos)
+    - `min_parallel_size`: por debajo de un producto `n x n` de este tamaño se multiplica en serie (por defecto `parallel.MIN_SIZE`)
+    """
     if not isinstance(other, Matrix):
       raise ValueError("Can only multiply by another Matrix.")
     
-    if len(self.data[0]) != len(other.data):
+    if self._storage.cols != other._storage.rows:
       raise ValueError("Number of columns in the first matrix must equal number of rows in the second matrix.")
     
-    result = []
-    for i in range(len(self.data)):
-      row = []
-      for j in range(len(other.data[0])):
-        value = sum(self.data[i][k] * other.data[k][j] for k in range(len(other.data)))
-        row.append(value)
-      result.append(row)
+    result_shape = (self._storage.rows, other._storage.cols)
+    if outofcore.use_out_of_core(result_shape, self._storage, other._storage):
+      return Matrix._wrap(outofcore.run_matmul(self._storage, other._storage))
     
-    return Matrix(result)
+    storage, other_storage = self._operands(other)
+    dtype = promote(storage.dtype, other_storage.dtype)
+    return Matrix._wrap(storage.matmul(
+      other_storage, dtype, block_size=block_size, strassen_threshold=strassen_threshold,
+      workers=workers, min_parallel_size=min_parallel_size))
+  
+  #region: Álgebra lineal
+  def lu(self, overwrite:bool=False) -> linalg.LU:
+    """Factorización `PA = LU` con pivoteo parcial, reutilizable para varios `solve`.
+    Con `overwrite=True` (solo `'array'` de `float64`) se factoriza en el propio almacenamiento.
+    """
+    if overwrite: self._writable()
+    return linalg.LU(self, overwrite)
+
+  def cholesky(self, overwrite:bool=False) -> linalg.Cholesky:
+    "Factorización `A = L Lᵀ` de una matriz simétrica definida positiva"
+    if overwrite: self._writable()
+    return linalg.Cholesky(self, overwrite)
+
+  def solve(self, b:"Matrix") -> "Matrix":
+    "Solución de `self * x = b`; cada columna de `b` es un lado derecho"
+    return self.lu().solve(b)
+
+  def inverse(self) -> "Matrix":
+    return self.lu().inverse()
+
+  def det(self) -> float:
+    return self.lu().det()
   
   def __getitem__(self, idx):
+    """`m[i, j]` devuelve un elemento. Si algún índice es un `slice` (`m[1:3, ::2]`,
+    `m[i, :]`, `m[:, j]`) devuelve una vista que comparte el almacenamiento.
+    """
     i,j = idx
-    return self.data[i][j]
+    if isinstance(i, slice) or isinstance(j, slice):
+      return self.view(i, j)
+    return self._storage.get(i, j)
 
   def __setitem__(self, idx:Tuple, value:int) -> None:
     i,j = idx
-    self.data[i][j] = value
+    self._writable().set(i, j, value)
   
-  def __iter__(self):
-    self._iter_row = 0
-    self._iter_col = 0
-    return self
+  #region: Reducciones
+  def _reduce(self, name:str, axis:Optional[int], dtype:Optional[str]):
+    """Con `axis=None` devuelve un valor; con `axis=0` una fila (`1 x cols`) y con
+    `axis=1` una columna (`rows x 1`), que se pueden operar con broadcasting.
+    """
+    if axis not in (None, 0, 1):
+      raise ValueError("axis must be None, 0 or 1.")
+    result = self._storage.reduce(name, axis)
+    if axis is None:
+      return result
+    rows = [result] if axis == 0 else [[value] for value in result]
+    cols = len(result) if axis == 0 else 1
+    return Matrix._wrap(self._storage.backend.from_rows(rows, cols, dtype))
+
+  def sum(self, axis:Optional[int]=None):
+    dtype = self.dtype and ('int64' if pytype(self.dtype) is int else 'float64')
+    return self._reduce('sum', axis, dtype)
+
+  def mean(self, axis:Optional[int]=None):
+    return self._reduce('mean', axis, self.dtype and 'float64')
+
+  def min(self, axis:Optional[int]=None):
+    return self._reduce('min', axis, self.dtype)
 
-  def __next__(self):
-    if self._iter_row >= len(self.data):
-      raise StopIteration
-    value = self.data[self._iter_row][self._iter_col]
-    self._iter_col += 1
-    if self._iter_col >= len(self.data[0]):
-      self._iter_col = 0
-      self._iter_row += 1
-    return value
+  def max(self, axis:Optional[int]=None):
+    return self._reduce('max', axis, self.dtype)
+
+  def argmax(self, axis:Optional[int]=None):
+    "Posición `(i, j)` del máximo o, por eje, el índice del máximo de cada columna o fila"
+    return self._reduce('argmax', axis, self.dtype and 'int64')
+
+  def norm(self, axis:Optional[int]=None):
+    "Norma de Frobenius o, por eje, la norma euclídea de cada columna o fila"
+    return self._reduce('norm', axis, self.dtype and 'float64')
+  #endregion
+  
+  #region: Vistas
+  def view(self, rows=slice(None), cols=slice(None)) -> "Matrix":
+    "Submatriz que comparte el almacenamiento; se copia solo al escribir en ella"
+    if isinstance(rows, int):
+      rows = range(self._storage.rows)[rows]
+      rows = slice(rows, rows + 1)
+    if isinstance(cols, int):
+      cols = range(self._storage.cols)[cols]
+      cols = slice(cols, cols + 1)
+    return Matrix._wrap(ViewStorage.of(self._storage, rows, cols))
+  
+  def row(self, i:int) -> "Matrix":
+    "Vista `1 x cols` de la fila `i`"
+    return self.view(i, slice(None))
+  
+  def col(self, j:int) -> "Matrix":
+    "Vista `rows x 1` de la columna `j`"
+    return self.view(slice(None), j)
+  
+  @property
+  def T(self) -> "Matrix":
+    return self.transpose()
+  
+  def transpose(self) -> "Matrix":
+    "Vista traspuesta (sin copiar valores)"
+    return Matrix._wrap(ViewStorage.of(self._storage, transposed=True))
+  
+  def copy(self) -> "Matrix":
+    return Matrix._wrap(self._storage.copy())
+  #endregion
+  
+  #region: Iteración
+  def __iter__(self) -> Iterator[Any]:
+    """Iterador de los valores en orden row-major.
+    Cada llamada crea un iterador independiente, por lo que se puede iterar
+    la misma matriz de forma anidada o concurrente.
+    """
+    return self._storage.iter_values()
+  
+  def rows(self) -> Iterator[List[Any]]:
+    "Iterador de las filas (copias como listas)"
+    return self._storage.iter_row_lists()
+  
+  def cols(self) -> Iterator[List[Any]]:
+    "Iterador de las columnas (copias como listas)"
+    return map(list, zip(*self._storage.iter_row_lists()))
+  
+  def enumerate_cells(self) -> Iterator[Tuple[Tuple[int,int],Any]]:
+    "Iterador de pares `((i, j), valor)`"
+    rows, cols = self.shape
+    return zip(product(range(rows), range(cols)), self._storage.iter_values())
+  #endregion
   
   def __getattr__(self, name):
-    if name.startswith('_'):
+    cell = _cell(name)
+    if cell is not None:
       try:
-        parts = name[1:].split('_')
-        if len(parts) == 2:
-          i, j = map(int, parts)
-          return self.data[i][j]
+        return self._storage.get(cell[0], cell[1])
       except Exception:
         pass
     raise AttributeError(f"'Matrix' object has no attribute '{name}'")
 
   def __setattr__(self, name, value):
-    if name.startswith('_') and name[1:].replace('_', '').isdigit():
+    cell = _cell(name)
+    if cell is not None and cell[2]:
       try:
-        parts = name[1:].split('_')
-        if len(parts) == 2:
-          i, j = map(int, parts)
-          self.data[i][j] = value
-          return
+        self._writable().set(cell[0], cell[1], value)
+        return
       except Exception:
         pass
     super().__setattr__(name, value)
   
   def as_type(self,_type):
-    _copy = deepcopy(self.data)
-    new_matrix = Matrix(_copy)
-    for i in range(len(self.data)):
-      for j in range(len(self.data[0])):
-        new_matrix.data[i][j] = _type(self.data[i][j])
-    return new_matrix
\ No newline at end of file
+    """Devuelve una copia de la matriz con los elementos convertidos a `_type`.
+    Si `_type` es un dtype numérico la conversión la hace el motor de almacenamiento
+    (`map` o `array` en C) sin un bucle de Python por elemento.
+    """
+    dtype = resolve_dtype(_type)
+    if dtype is not None:
+      return Matrix._wrap(self._storage.astype(dtype))
+    rows = [list(map(_type, row)) for row in self._storage.iter_rows()]
+    return Matrix._wrap(ListStorage(rows))
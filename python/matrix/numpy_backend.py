@@ -0,0 +1,175 @@
+"""Motor de almacenamiento respaldado por un `numpy.ndarray`.
+
+NumPy es opcional: si no está instalado el motor no se registra y `Matrix`
+sigue funcionando con los motores de Python puro (`'list'` y `'array'`).
+"""
+import operator
+from array import array
+from itertools import chain
+from typing import Any, Optional
+
+from storage import Storage, ArrayStorage, BroadcastStorage, DTYPES, register_backend, get_backend, infer_dtype
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+HAS_NUMPY = np is not None
+
+# operadores de Python -> ufuncs equivalentes
+_UFUNCS = {
+  operator.add: np.add,
+  operator.sub: np.subtract,
+  operator.mul: np.multiply,
+} if HAS_NUMPY else {}
+
+
+def _require_numpy() -> None:
+  if np is None:
+    raise ImportError("NumPy is required for this operation. Install it with `pip install numpy`.")
+
+def _operand(other: Any) -> Any:
+  "Operando de una ufunc; una `BroadcastStorage` se pasa sin expandir y NumPy hace el broadcasting"
+  if isinstance(other, BroadcastStorage) and isinstance(other.base, NumpyStorage):
+    other = other.base
+  return other.arr if isinstance(other, NumpyStorage) else other
+
+def _dtype_name(arr) -> Optional[str]:
+  name = arr.dtype.name
+  return name if name in DTYPES else None
+
+
+class NumpyStorage(Storage):
+  """Almacenamiento sobre un `ndarray` bidimensional.
+  Las operaciones aritméticas y las conversiones de tipo son vectorizadas.
+  """
+  kind = 'numpy'
+  __slots__ = ('arr', 'dtype')
+
+  def __init__(self, arr) -> None:
+    if arr.ndim != 2:
+      raise ValueError(f"Expected a 2-dimensional array, got {arr.ndim} dimensions.")
+    self.arr = arr
+    self.dtype = _dtype_name(arr)
+
+  @property
+  def rows(self) -> int:
+    return self.arr.shape[0]
+
+  @property
+  def cols(self) -> int:
+    return self.arr.shape[1]
+
+  @classmethod
+  def from_rows(cls, rows, cols, dtype=None):
+    rows = [list(row) for row in rows]
+    arr = np.array(rows, dtype=dtype or infer_dtype(rows))
+    return cls(arr.reshape(len(rows), cols))
+
+  @classmethod
+  def filled(cls, rows, cols, value, dtype=None):
+    return cls(np.full((rows, cols), value, dtype=dtype or 'float64'))
+
+  @classmethod
+  def convert(cls, storage, dtype=None):
+    if isinstance(storage, ArrayStorage):
+      # comparte la memoria del `array.array` mediante el protocolo de buffer
+      arr = np.frombuffer(storage.buf, dtype=storage.dtype).reshape(storage.rows, storage.cols)
+      return cls(arr if dtype is None else arr.astype(dtype))
+    return super().convert(storage, dtype)
+
+  def get(self, i, j):
+    return self.arr[i, j].item()
+
+  def set(self, i, j, value):
+    self.arr[i, j] = value
+
+  def row(self, i):
+    return self.arr[i]
+
+  def set_row(self, i, values):
+    self.arr[i] = list(values)
+
+  def iter_rows(self):
+    return iter(self.arr)
+
+  def flat(self):
+    return self.arr.ravel()
+
+  def iter_values(self):
+    # `tolist` por filas convierte a escalares de Python sin copiar toda la matriz
+    return chain.from_iterable(self.iter_row_lists())
+
+  def iter_row_lists(self):
+    return (row.tolist() for row in self.arr)
+
+  def to_lists(self):
+    return self.arr.tolist()
+
+  def copy(self):
+    return NumpyStorage(self.arr.copy())
+
+  def astype(self, dtype):
+    return NumpyStorage(self.arr.astype(dtype))
+
+  def elementwise(self, op, other, dtype):
+    b = _operand(other)
+    ufunc = _UFUNCS.get(op)
+    if ufunc is None:
+      return super().elementwise(op, other, dtype)
+    return NumpyStorage(ufunc(self.arr, b, dtype=dtype))
+
+  def ielementwise(self, op, other):
+    b = _operand(other)
+    ufunc = _UFUNCS.get(op)
+    if ufunc is None:
+      return super().ielementwise(op, other)
+    ufunc(self.arr, b, out=self.arr)
+
+  def reduce(self, name, axis=None):
+    if name == 'norm':
+      result = np.linalg.norm(self.arr, axis=axis)
+    elif name == 'argmax' and axis is None:
+      return tuple(int(i) for i in np.unravel_index(self.arr.argmax(), self.arr.shape))
+    else:
+      result = getattr(self.arr, name)(axis=axis)
+    return result.item() if axis is None else result.tolist()
+
+  def matmul(self, other, dtype, **options):
+    # los parámetros del kernel de Python puro no aplican a BLAS
+    result = self.arr @ other.arr
+    if dtype is not None:
+      result = result.astype(dtype, copy=False)
+    return NumpyStorage(result)
+
+
+if HAS_NUMPY:
+  register_backend(NumpyStorage)
+
+
+def to_ndarray(storage: Storage) -> Any:
+  """Convierte un almacenamiento en `ndarray`.
+  Sin copia para los motores `'numpy'` y `'array'`; el motor `'list'` siempre copia.
+  """
+  _require_numpy()
+  if isinstance(storage, NumpyStorage):
+    return storage.arr
+  return NumpyStorage.convert(storage).arr
+
+def from_ndarray(arr: Any, storage: str = 'numpy') -> Storage:
+  """Crea un almacenamiento del motor `storage` a partir de un `ndarray`.
+  Con `'numpy'` el array se comparte sin copia; `'array'` copia el buffer una sola vez.
+  """
+  _require_numpy()
+  arr = np.asarray(arr)
+  if storage == NumpyStorage.kind:
+    return NumpyStorage(arr)
+  if storage == ArrayStorage.kind:
+    dtype = _dtype_name(arr)
+    if dtype is None:
+      raise TypeError(f"Unsupported dtype '{arr.dtype}' for array storage.")
+    buf = array(DTYPES[dtype])
+    buf.frombytes(np.ascontiguousarray(arr).data.cast('B'))
+    return ArrayStorage(buf, arr.shape[0], arr.shape[1], dtype)
+  return get_backend(storage).convert(NumpyStorage(arr))
@@ -0,0 +1,216 @@
+"""Operaciones por bloques (tiles) sobre matrices guardadas en disco.
+
+Los operandos y el resultado son ficheros con el formato de `serialization`.
+Cada operación lee bloques `tile x tile` con `seek`/`read`, los guarda en una
+caché LRU limitada por `memory_limit` bytes y escribe el resultado bloque a
+bloque, de modo que la memoria usada no depende del tamaño de las matrices.
+El lado de los bloques cuenta también con los valores de Python (objetos `int` o
+`float`, bastante mayores que `itemsize`) que crean los núcleos al multiplicar,
+así que el pico se mantiene cerca de `memory_limit`.
+
+`Matrix` usa este modo automáticamente cuando `MEMORY_LIMIT` no es `None`,
+los dos operandos están cargados con `mmap=True` (en modo `'r'` o `'r+'`: con `'c'`
+las escrituras solo están en memoria y el fichero no las refleja) y los datos
+superan el límite. Los resultados se proyectan en modo `'r+'` sobre un fichero
+temporal, así que se pueden modificar sin cargarlos en memoria.
+"""
+import os
+import sys
+import tempfile
+import weakref
+from array import array
+from collections import OrderedDict
+from math import isqrt
+from operator import add
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import kernels
+import serialization
+from storage import Storage, DTYPES, promote, pytype
+
+# Límite (en bytes de datos) a partir del cual se opera por bloques; `None` lo desactiva
+MEMORY_LIMIT: Optional[int] = None
+# Directorio de los resultados temporales (`None` usa el del sistema)
+TEMP_DIR: Optional[str] = None
+
+Tile = List[array]
+
+# Bytes por valor de un bloque convertido en listas de Python: el puntero y el objeto
+_BOXED = max(sys.getsizeof(0.0), sys.getsizeof(2**62)) + 8
+
+
+class TiledFile:
+  "Fichero de matriz accesible por bloques rectangulares"
+
+  def __init__(self, path: str, mode: str = 'rb') -> None:
+    self.path = path
+    self.file = open(path, mode)
+    self.dtype, self.rows, self.cols = serialization.read_header(self.file)
+    self.typecode = DTYPES[self.dtype]
+    self.itemsize = array(self.typecode).itemsize
+
+  @classmethod
+  def create(cls, path: str, rows: int, cols: int, dtype: str) -> "TiledFile":
+    "Crea un fichero con la cabecera y espacio (a ceros) para `rows x cols` valores"
+    with open(path, 'wb') as f:
+      serialization.write_header(f, dtype, rows, cols)
+      f.truncate(serialization.HEADER.size + rows * cols * array(DTYPES[dtype]).itemsize)
+    return cls(path, 'r+b')
+
+  def _offset(self, i: int, j: int) -> int:
+    return serialization.HEADER.size + (i * self.cols + j) * self.itemsize
+
+  def read_block(self, r0: int, r1: int, c0: int, c1: int) -> Tile:
+    rows = []
+    for i in range(r0, r1):
+      self.file.seek(self._offset(i, c0))
+      row = array(self.typecode)
+      row.frombytes(self.file.read((c1 - c0) * self.itemsize))
+      if sys.byteorder != 'little': row.byteswap()
+      rows.append(row)
+    return rows
+
+  def write_block(self, r0: int, c0: int, rows: Iterable[Sequence[Any]]) -> None:
+    for i, values in enumerate(rows, r0):
+      row = array(self.typecode, values)
+      if sys.byteorder != 'little': row.byteswap()
+      self.file.seek(self._offset(i, c0))
+      row.tofile(self.file)
+
+  def close(self) -> None:
+    self.file.close()
+
+  def __enter__(self) -> "TiledFile":
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
+
+
+class TileCache:
+  "Caché LRU de bloques con capacidad en bytes"
+
+  def __init__(self, capacity: int) -> None:
+    self.capacity = capacity
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self._tiles: "OrderedDict[Any, Tuple[Tile, int]]" = OrderedDict()
+
+  def get(self, key: Any, load: Callable[[], Tile]) -> Tile:
+    if key in self._tiles:
+      self._tiles.move_to_end(key)
+      self.hits += 1
+      return self._tiles[key][0]
+    self.misses += 1
+    tile = load()
+    nbytes = sum(len(row) * row.itemsize for row in tile)
+    while self._tiles and self.size + nbytes > self.capacity:
+      _, (_, evicted) = self._tiles.popitem(last=False)
+      self.size -= evicted
+    if nbytes <= self.capacity:
+      self._tiles[key] = (tile, nbytes)
+      self.size += nbytes
+    return tile
+
+
+def tile_size(memory_limit: int, itemsize: int) -> int:
+  """Lado de bloque para `memory_limit`: la mitad del límite es para la caché y la otra
+  mitad para lo que se usa en cada paso del producto, por valor: el acumulador tipado
+  (8 bytes), el bloque recién leído antes de entrar en la caché (`itemsize`), el bloque
+  de B traspuesto y el producto parcial (dos `_BOXED`) y los recortes de filas y
+  columnas que hace el núcleo (dos punteros).
+  """
+  return max(1, isqrt(memory_limit // 2 // (8 + itemsize + 2 * _BOXED + 16)))
+
+def _ranges(n: int, step: int) -> List[Tuple[int, int]]:
+  return [(start, min(start + step, n)) for start in range(0, n, step)]
+
+def elementwise(op: Callable[[Any, Any], Any], a_path: str, b_path: str, out_path: str,
+                memory_limit: Optional[int] = None, tile: Optional[int] = None) -> None:
+  "Aplica `op` elemento a elemento leyendo y escribiendo un bloque cada vez"
+  memory_limit = memory_limit or MEMORY_LIMIT or 64 * 2**20
+  with TiledFile(a_path) as a, TiledFile(b_path) as b:
+    if (a.rows, a.cols) != (b.rows, b.cols):
+      raise ValueError("Matrices must have the same dimensions for elementwise operations.")
+    dtype = promote(a.dtype, b.dtype)
+    # sin reutilización: cada bloque se lee una vez, la caché no aporta nada
+    tile = tile or tile_size(memory_limit, max(a.itemsize, b.itemsize))
+    with TiledFile.create(out_path, a.rows, a.cols, dtype) as out:
+      for r0, r1 in _ranges(a.rows, tile):
+        for c0, c1 in _ranges(a.cols, tile):
+          a_tile, b_tile = a.read_block(r0, r1, c0, c1), b.read_block(r0, r1, c0, c1)
+          out.write_block(r0, c0, (map(op, x, y) for x, y in zip(a_tile, b_tile)))
+
+def matmul(a_path: str, b_path: str, out_path: str,
+           memory_limit: Optional[int] = None, tile: Optional[int] = None) -> TileCache:
+  """Producto por bloques: cada bloque `(i, j)` del resultado acumula `A(i, k) x B(k, j)`.
+  Los bloques de A de la fila `i` se reutilizan desde la caché para cada `j`.
+  Devuelve la caché para consultar aciertos y fallos.
+  """
+  memory_limit = memory_limit or MEMORY_LIMIT or 64 * 2**20
+  with TiledFile(a_path) as a, TiledFile(b_path) as b:
+    if a.cols != b.rows:
+      raise ValueError("Number of columns in the first matrix must equal number of rows in the second matrix.")
+    dtype = promote(a.dtype, b.dtype)
+    tile = tile or tile_size(memory_limit, max(a.itemsize, b.itemsize))
+    cache = TileCache(memory_limit // 2)
+    k_ranges = _ranges(a.cols, tile)
+    # acumulador tipado: 8 bytes por valor en lugar de un objeto de Python
+    typecode = 'd' if pytype(dtype) is float else 'q'
+    with TiledFile.create(out_path, a.rows, b.cols, dtype) as out:
+      for r0, r1 in _ranges(a.rows, tile):
+        for c0, c1 in _ranges(b.cols, tile):
+          acc = [array(typecode, bytes(8 * (c1 - c0))) for _ in range(r1 - r0)]
+          for k0, k1 in k_ranges:
+            a_tile = cache.get(('a', r0, k0), lambda: a.read_block(r0, r1, k0, k1))
+            b_tile = cache.get(('b', k0, c0), lambda: b.read_block(k0, k1, c0, c1))
+            product = kernels.matmul_blocked(a_tile, b_tile, c1 - c0)
+            for row, part in zip(acc, product):
+              row[:] = array(typecode, map(add, row, part))
+            del product
+          out.write_block(r0, c0, acc)
+  return cache
+
+#region: Integración con `Matrix`
+def _path(storage: Storage) -> Optional[str]:
+  "Fichero del que leer los bloques, si tiene los mismos valores que `storage`"
+  if not getattr(storage, 'synced', False):
+    return None
+  return storage.path
+
+def use_out_of_core(result_shape: Tuple[int, int], *storages: Storage) -> bool:
+  "Indica si operar por bloques: límite activo, operandos en fichero y datos por encima del límite"
+  if MEMORY_LIMIT is None or not all(_path(s) for s in storages):
+    return False
+  itemsize = max(array(DTYPES[s.dtype]).itemsize for s in storages)
+  cells = sum(s.rows * s.cols for s in storages) + result_shape[0] * result_shape[1]
+  return cells * itemsize > MEMORY_LIMIT
+
+def _remove(path: str) -> None:
+  try:
+    os.unlink(path)
+  except OSError:
+    pass
+
+def _temp_result(run: Callable[[str], Any]) -> Storage:
+  "Ejecuta `run` sobre un fichero temporal que se borra cuando se libera el resultado"
+  fd, path = tempfile.mkstemp(suffix='.lpmx', dir=TEMP_DIR)
+  os.close(fd)
+  try:
+    run(path)
+    storage = serialization.load(path, mmap=True, mode='r+')
+  except BaseException:
+    _remove(path)
+    raise
+  weakref.finalize(storage, _remove, path)
+  return storage
+
+def run_elementwise(op: Callable[[Any, Any], Any], a: Storage, b: Storage) -> Storage:
+  "Operación elemento a elemento por bloques; el resultado queda proyectado con `mmap`"
+  return _temp_result(lambda path: elementwise(op, _path(a), _path(b), path))
+
+def run_matmul(a: Storage, b: Storage) -> Storage:
+  "Producto por bloques; el resultado queda proyectado con `mmap`"
+  return _temp_result(lambda path: matmul(_path(a), _path(b), path))
+#endregion
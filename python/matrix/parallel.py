@@ -0,0 +1,107 @@
+"""Multiplicación de matrices en varios procesos.
+
+Los operandos se copian una vez a bloques de `multiprocessing.shared_memory`
+(A en orden row-major y B traspuesta) y cada proceso calcula una banda de filas
+del resultado escribiendo directamente en un tercer bloque compartido. Así no se
+serializa `data` con pickle: a los procesos solo se les envían nombres y rangos.
+"""
+import atexit
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Optional
+
+import kernels
+
+# Número de procesos por defecto (1 desactiva el modo paralelo)
+WORKERS: int = 1
+# Por debajo de un producto equivalente a `MIN_SIZE x MIN_SIZE` se multiplica en serie
+MIN_SIZE: int = 128
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+  "`None` usa `WORKERS`; `0` usa todos los núcleos"
+  if workers is None: workers = WORKERS
+  if workers == 0: workers = os.cpu_count() or 1
+  return workers
+
+def use_parallel(rows: int, inner: int, cols: int, workers: Optional[int] = None, min_size: Optional[int] = None) -> bool:
+  "Indica si un producto `rows x inner` por `inner x cols` debe repartirse entre procesos"
+  min_size = MIN_SIZE if min_size is None else min_size
+  work = rows * inner * cols
+  return resolve_workers(workers) > 1 and rows > 1 and work > 0 and work >= min_size ** 3
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+  if workers not in _executors:
+    _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+  return _executors[workers]
+
+@atexit.register
+def shutdown() -> None:
+  "Cierra los procesos reutilizados entre llamadas"
+  for executor in _executors.values():
+    executor.shutdown()
+  _executors.clear()
+
+def _shared_copy(buf: array) -> SharedMemory:
+  shm = SharedMemory(create=True, size=max(len(buf) * buf.itemsize, 1))
+  view = memoryview(buf).cast('B')
+  shm.buf[:len(view)] = view
+  view.release()
+  return shm
+
+def _band(a_name: str, a_code: str, bt_name: str, bt_code: str, out_name: str, out_code: str,
+          inner: int, cols: int, start: int, stop: int, block_size: Optional[int]) -> None:
+  "Calcula las filas `[start, stop)` del resultado dentro del proceso"
+  shms = [SharedMemory(name=name) for name in (a_name, bt_name, out_name)]
+  a = shms[0].buf.cast(a_code)
+  bt = shms[1].buf.cast(bt_code)
+  out = shms[2].buf.cast(out_code)
+  try:
+    a_rows = [a[i * inner:(i + 1) * inner] for i in range(start, stop)]
+    bt_rows = [bt[j * inner:(j + 1) * inner] for j in range(cols)]
+    result = kernels.matmul_transposed(a_rows, bt_rows, block_size)
+    out[start * cols:stop * cols] = array(out_code, chain.from_iterable(result))
+  finally:
+    # las vistas deben liberarse antes de cerrar la memoria compartida
+    a_rows = bt_rows = None
+    for view in (a, bt, out): view.release()
+    for shm in shms: shm.close()
+
+def matmul(a: array, b: array, rows: int, inner: int, cols: int, out_code: str,
+           workers: Optional[int] = None, block_size: Optional[int] = None) -> array:
+  """Producto de `a` (`rows x inner`) por `b` (`inner x cols`), ambos planos en orden row-major.
+  Devuelve el resultado plano como `array` con typecode `out_code`.
+  """
+  workers = resolve_workers(workers)
+  bt = array(b.typecode)
+  for j in range(cols):
+    bt.extend(b[j::cols])
+
+  itemsize = array(out_code).itemsize
+  shm_a, shm_bt = _shared_copy(a), _shared_copy(bt)
+  shm_out = SharedMemory(create=True, size=rows * cols * itemsize)
+  try:
+    executor = _executor(workers)
+    step = -(-rows // workers)
+    futures = [
+      executor.submit(_band, shm_a.name, a.typecode, shm_bt.name, bt.typecode, shm_out.name, out_code,
+                      inner, cols, start, min(start + step, rows), block_size)
+      for start in range(0, rows, step)
+    ]
+    for future in futures:
+      future.result()
+    # única copia del resultado: de la memoria compartida al `array` final
+    out = array(out_code)
+    view = shm_out.buf[:rows * cols * itemsize]
+    out.frombytes(view)
+    view.release()
+    return out
+  finally:
+    for shm in (shm_a, shm_bt, shm_out):
+      shm.close()
+      shm.unlink()
@@ -0,0 +1,150 @@
+"""Formato binario de `Matrix` y carga mediante `mmap`.
+
+Un fichero tiene una cabecera de 32 bytes seguida de los valores en orden
+row-major, little-endian y sin separadores:
+
+  magic `LPMX` | versión (u8) | dtype (u8) | 2 bytes libres | rows (u64) | cols (u64) | 8 bytes libres
+
+Con `mmap=True` los valores no se leen al cargar: el almacenamiento es una
+`memoryview` sobre el fichero proyectado y el sistema operativo solo lee las
+páginas que tocan `__getitem__` o los kernels aritméticos.
+"""
+import mmap as _mmap
+import struct
+import sys
+from array import array
+from typing import Any, Tuple
+
+from storage import Storage, ArrayStorage, DTYPES, infer_dtype
+
+MAGIC = b'LPMX'
+VERSION = 1
+HEADER = struct.Struct('<4sBB2xQQ8x')
+_DTYPE_NAMES = list(DTYPES)
+_ACCESS = {
+  'r':  _mmap.ACCESS_READ,   # solo lectura
+  'r+': _mmap.ACCESS_WRITE,  # las escrituras se guardan en el fichero
+  'c':  _mmap.ACCESS_COPY,   # copy-on-write en memoria, el fichero no cambia
+}
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class MmapStorage(ArrayStorage):
+  """Almacenamiento contiguo sobre un fichero proyectado en memoria.
+  Se comporta como `'array'` pero `buf` es una `memoryview` del fichero;
+  los resultados de operar con él se crean en memoria como `ArrayStorage`.
+  `mode` es el de `load`: con `'r'` `Matrix` copia los valores a memoria antes de
+  escribir y con `'c'` el fichero no refleja las escrituras.
+  """
+  kind = 'mmap'
+  __slots__ = ('mapping', 'path', 'mode', '__weakref__')
+
+  def __init__(self, mapping: _mmap.mmap, buf: memoryview, rows: int, cols: int, dtype: str, path: str,
+               mode: str = 'r') -> None:
+    super().__init__(buf, rows, cols, dtype)
+    self.mapping = mapping
+    self.path = path
+    self.mode = mode
+
+  @property
+  def readonly(self) -> bool:
+    return self.mode == 'r'
+
+  @property
+  def synced(self) -> bool:
+    "El fichero tiene los mismos valores que la proyección (no es copy-on-write)"
+    return self.mode != 'c'
+
+  @property
+  def backend(self):
+    return ArrayStorage
+
+  @classmethod
+  def from_flat(cls, values, rows, cols, dtype):
+    return ArrayStorage.from_flat(values, rows, cols, dtype)
+
+  @classmethod
+  def from_rows(cls, rows, cols, dtype=None):
+    return ArrayStorage.from_rows(rows, cols, dtype)
+
+  @classmethod
+  def filled(cls, rows, cols, value, dtype=None):
+    return ArrayStorage.filled(rows, cols, value, dtype)
+
+  @classmethod
+  def from_buffer(cls, buf, rows, cols, dtype):
+    return ArrayStorage.from_buffer(buf, rows, cols, dtype)
+
+  def to_array(self):
+    buf = array(self.typecode)
+    buf.frombytes(self.buf.cast('B'))
+    return buf
+
+  def copy(self):
+    return ArrayStorage(self.to_array(), self.rows, self.cols, self.dtype)
+
+  def close(self) -> None:
+    "Libera la proyección; el almacenamiento deja de ser utilizable"
+    self.buf.release()
+    self.mapping.close()
+
+
+def _payload(storage: Storage) -> Tuple[str, array]:
+  if isinstance(storage, ArrayStorage):
+    return storage.dtype, storage.to_array()
+  dtype = storage.dtype or infer_dtype(storage.iter_rows())
+  return dtype, array(DTYPES[dtype], storage.flat())
+
+def write_header(f: Any, dtype: str, rows: int, cols: int) -> None:
+  f.write(HEADER.pack(MAGIC, VERSION, _DTYPE_NAMES.index(dtype), rows, cols))
+
+def save(storage: Storage, path: str) -> None:
+  "Escribe `storage` en `path` con el formato binario"
+  dtype, buf = _payload(storage)
+  if not _LITTLE_ENDIAN:
+    buf = array(buf.typecode, buf)
+    buf.byteswap()
+  with open(path, 'wb') as f:
+    write_header(f, dtype, storage.rows, storage.cols)
+    buf.tofile(f)
+
+def read_header(f: Any) -> Tuple[str, int, int]:
+  "Lee y valida la cabecera; devuelve `(dtype, rows, cols)`"
+  raw = f.read(HEADER.size)
+  if len(raw) != HEADER.size:
+    raise ValueError("File is too short to be a matrix file.")
+  magic, version, dtype_code, rows, cols = HEADER.unpack(raw)
+  if magic != MAGIC:
+    raise ValueError("Not a matrix file (bad magic number).")
+  if version != VERSION:
+    raise ValueError(f"Unsupported matrix file version {version}.")
+  if dtype_code >= len(_DTYPE_NAMES):
+    raise ValueError(f"Unknown dtype code {dtype_code} in matrix file.")
+  return _DTYPE_NAMES[dtype_code], rows, cols
+
+def load(path: str, mmap: bool = False, mode: str = 'r') -> ArrayStorage:
+  """Lee un fichero escrito con `save`.
+
+  - `mmap=False`: copia los valores a un `array` en memoria
+  - `mmap=True`: proyecta el fichero; `mode` es `'r'` (solo lectura), `'r+'` (escribe en el fichero) o `'c'` (copy-on-write)
+  """
+  with open(path, 'r+b' if mmap and mode == 'r+' else 'rb') as f:
+    dtype, rows, cols = read_header(f)
+    typecode = DTYPES[dtype]
+    count = rows * cols
+
+    if not mmap or not _LITTLE_ENDIAN:
+      buf = array(typecode)
+      buf.fromfile(f, count)
+      if not _LITTLE_ENDIAN: buf.byteswap()
+      return ArrayStorage(buf, rows, cols, dtype)
+
+    if mode not in _ACCESS:
+      raise ValueError(f"Unknown mmap mode '{mode}'. Available: {', '.join(_ACCESS)}.")
+    mapping = _mmap.mmap(f.fileno(), 0, access=_ACCESS[mode])
+  end = HEADER.size + count * array(typecode).itemsize
+  if len(mapping) < end:
+    mapping.close()
+    raise ValueError("Matrix file is truncated.")
+  view = memoryview(mapping)[HEADER.size:end].cast(typecode)
+  return MmapStorage(mapping, view, rows, cols, dtype, path, mode)
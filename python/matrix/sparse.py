@@ -0,0 +1,350 @@
+"""Matrices dispersas que interoperan con `Matrix`.
+
+- `COOMatrix`: tripletas `(i, j, valor)`, pensada para construir la matriz
+- `CSRMatrix`: filas comprimidas, para aritmética y acceso por filas
+- `CSCMatrix`: columnas comprimidas, para acceso por columnas
+
+Solo se almacenan los elementos distintos de cero. `+` y `*` aceptan tanto matrices
+dispersas como densas; el resultado de operar dos dispersas se convierte a `Matrix`
+si su densidad supera `DENSITY_THRESHOLD`.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from matrix import Matrix
+
+# Densidad a partir de la cual conviene una matriz densa
+DENSITY_THRESHOLD: float = 0.25
+# Convertir a densa los resultados de operar dos matrices dispersas demasiado llenas
+AUTO_DENSIFY: bool = True
+
+
+class SparseMatrix:
+  "Base común de los formatos dispersos"
+  is_sparse = True
+  format = ''
+
+  shape: Tuple[int, int]
+
+  @property
+  def nnz(self) -> int:
+    "Número de elementos almacenados"
+    raise NotImplementedError
+
+  @property
+  def density(self) -> float:
+    rows, cols = self.shape
+    return self.nnz / (rows * cols) if rows and cols else 0.0
+
+  def _check_index(self, idx: Tuple[int, int]) -> Tuple[int, int]:
+    i, j = idx
+    rows, cols = self.shape
+    if not (-rows <= i < rows and -cols <= j < cols):
+      raise IndexError("Matrix index out of range.")
+    return i % rows, j % cols
+
+  def tocoo(self) -> "COOMatrix":
+    raise NotImplementedError
+
+  def tocsr(self) -> "CSRMatrix":
+    return self.tocoo().tocsr()
+
+  def tocsc(self) -> "CSCMatrix":
+    return self.tocsr().tocsc()
+
+  def to_dense(self, storage: str = 'list', dtype: Any = None) -> Matrix:
+    rows, cols = self.shape
+    data = [[0] * cols for _ in range(rows)]
+    coo = self.tocoo()
+    for i, j, value in zip(coo.row, coo.col, coo.data):
+      data[i][j] = value
+    return Matrix(data, storage=storage, dtype=dtype)
+
+  def __add__(self, other: Union["SparseMatrix", Matrix]) -> Union["SparseMatrix", Matrix]:
+    if not isinstance(other, (SparseMatrix, Matrix)):
+      raise ValueError("Can only add another Matrix.")
+    if self.shape != other.shape:
+      raise ValueError("Matrices must have the same dimensions for addition.")
+    if isinstance(other, SparseMatrix):
+      return auto(self.tocsr()._add_sparse(other.tocsr()))
+    return self.tocsr()._add_dense(other)
+
+  # la suma es conmutativa
+  __radd__ = __add__
+
+  def __mul__(self, other: Union["SparseMatrix", Matrix]) -> Union["SparseMatrix", Matrix]:
+    if not isinstance(other, (SparseMatrix, Matrix)):
+      raise ValueError("Can only multiply by another Matrix.")
+    if self.shape[1] != other.shape[0]:
+      raise ValueError("Number of columns in the first matrix must equal number of rows in the second matrix.")
+    if isinstance(other, SparseMatrix):
+      return auto(self.tocsr()._mul_sparse(other.tocsr()))
+    return self.tocsr()._mul_dense(other)
+
+  def __rmul__(self, other: Matrix) -> Matrix:
+    if not isinstance(other, Matrix):
+      raise ValueError("Can only multiply by another Matrix.")
+    if other.shape[1] != self.shape[0]:
+      raise ValueError("Number of columns in the first matrix must equal number of rows in the second matrix.")
+    return self.tocsr()._rmul_dense(other)
+
+  def __str__(self) -> str:
+    return str(self.to_dense())
+
+  def __repr__(self) -> str:
+    return f"<{type(self).__name__} shape={self.shape} nnz={self.nnz}>"
+
+
+class COOMatrix(SparseMatrix):
+  """Formato de coordenadas. Asignar es O(1); los ceros asignados se eliminan al convertir.
+  """
+  format = 'coo'
+
+  def __init__(self, rows: int, cols: int) -> None:
+    self.shape = (rows, cols)
+    self.row: List[int] = []
+    self.col: List[int] = []
+    self.data: List[Any] = []
+    self._index: Dict[Tuple[int, int], int] = {}
+
+  @property
+  def nnz(self) -> int:
+    return len(self.data)
+
+  def __getitem__(self, idx: Tuple[int, int]) -> Any:
+    pos = self._index.get(self._check_index(idx))
+    return 0 if pos is None else self.data[pos]
+
+  def __setitem__(self, idx: Tuple[int, int], value: Any) -> None:
+    key = self._check_index(idx)
+    pos = self._index.get(key)
+    if pos is not None:
+      self.data[pos] = value
+    elif value != 0:
+      self._index[key] = len(self.data)
+      self.row.append(key[0])
+      self.col.append(key[1])
+      self.data.append(value)
+
+  def tocoo(self) -> "COOMatrix":
+    return self
+
+  def tocsr(self) -> "CSRMatrix":
+    rows, cols = self.shape
+    order = sorted(range(self.nnz), key=lambda p: (self.row[p], self.col[p]))
+    indptr = array('q', [0]) * (rows + 1)
+    indices, data = array('q'), []
+    for p in order:
+      if self.data[p] == 0: continue
+      indptr[self.row[p] + 1] += 1
+      indices.append(self.col[p])
+      data.append(self.data[p])
+    for i in range(rows):
+      indptr[i + 1] += indptr[i]
+    return CSRMatrix(self.shape, indptr, indices, data)
+
+
+class _Compressed(SparseMatrix):
+  """Formato comprimido por un eje (`major`): los índices del otro eje (`minor`)
+  de cada fila (CSR) o columna (CSC) están ordenados, lo que permite buscar con
+  `bisect` en O(log nnz).
+  """
+
+  def __init__(self, shape: Tuple[int, int], indptr: array, indices: array, data: List[Any]) -> None:
+    self.shape = shape
+    self.indptr = indptr
+    self.indices = indices
+    self.data = data
+
+  @property
+  def nnz(self) -> int:
+    return len(self.data)
+
+  def _axes(self, i: int, j: int) -> Tuple[int, int]:
+    "Coordenadas `(major, minor)` del elemento `(i, j)`"
+    raise NotImplementedError
+
+  def _find(self, idx: Tuple[int, int]) -> Tuple[int, int, int]:
+    major, minor = self._axes(*self._check_index(idx))
+    hi = self.indptr[major + 1]
+    return major, minor, bisect_left(self.indices, minor, self.indptr[major], hi)
+
+  def __getitem__(self, idx: Tuple[int, int]) -> Any:
+    major, minor, pos = self._find(idx)
+    if pos < self.indptr[major + 1] and self.indices[pos] == minor:
+      return self.data[pos]
+    return 0
+
+  def __setitem__(self, idx: Tuple[int, int], value: Any) -> None:
+    "Sobrescribir es O(log nnz); insertar un elemento nuevo desplaza los siguientes (O(nnz))"
+    major, minor, pos = self._find(idx)
+    if pos < self.indptr[major + 1] and self.indices[pos] == minor:
+      self.data[pos] = value
+      return
+    if value == 0: return
+    self.indices.insert(pos, minor)
+    self.data.insert(pos, value)
+    for k in range(major + 1, len(self.indptr)):
+      self.indptr[k] += 1
+
+  def _transposed(self) -> Tuple[array, array, List[Any]]:
+    "Estructura comprimida por el otro eje (conversión CSR <-> CSC)"
+    n_minor = self.shape[1] if self.format == 'csr' else self.shape[0]
+    indptr = array('q', [0]) * (n_minor + 1)
+    for minor in self.indices:
+      indptr[minor + 1] += 1
+    for k in range(n_minor):
+      indptr[k + 1] += indptr[k]
+    nxt = array('q', indptr)
+    indices = array('q', [0]) * self.nnz
+    data: List[Any] = [0] * self.nnz
+    for major in range(len(self.indptr) - 1):
+      for p in range(self.indptr[major], self.indptr[major + 1]):
+        minor = self.indices[p]
+        dest = nxt[minor]
+        indices[dest] = major
+        data[dest] = self.data[p]
+        nxt[minor] += 1
+    return indptr, indices, data
+
+  def tocoo(self) -> COOMatrix:
+    coo = COOMatrix(*self.shape)
+    for major in range(len(self.indptr) - 1):
+      for p in range(self.indptr[major], self.indptr[major + 1]):
+        i, j = self._axes(major, self.indices[p])
+        coo[i, j] = self.data[p]
+    return coo
+
+
+class CSRMatrix(_Compressed):
+  "Compressed Sparse Row: `indices[indptr[i]:indptr[i + 1]]` son las columnas de la fila `i`"
+  format = 'csr'
+
+  def _axes(self, i, j):
+    return i, j
+
+  def tocsr(self) -> "CSRMatrix":
+    return self
+
+  def tocsc(self) -> "CSCMatrix":
+    return CSCMatrix(self.shape, *self._transposed())
+
+  def _row(self, i: int) -> Tuple[array, List[Any]]:
+    lo, hi = self.indptr[i], self.indptr[i + 1]
+    return self.indices[lo:hi], self.data[lo:hi]
+
+  def _add_sparse(self, other: "CSRMatrix") -> "CSRMatrix":
+    indptr, indices, data = array('q', [0]), array('q'), []
+    for i in range(self.shape[0]):
+      a_idx, a_val = self._row(i)
+      b_idx, b_val = other._row(i)
+      p = q = 0
+      while p < len(a_idx) or q < len(b_idx):
+        if q == len(b_idx) or (p < len(a_idx) and a_idx[p] < b_idx[q]):
+          j, value = a_idx[p], a_val[p]
+          p += 1
+        elif p == len(a_idx) or b_idx[q] < a_idx[p]:
+          j, value = b_idx[q], b_val[q]
+          q += 1
+        else:
+          j, value = a_idx[p], a_val[p] + b_val[q]
+          p += 1
+          q += 1
+        if value != 0:
+          indices.append(j)
+          data.append(value)
+      indptr.append(len(data))
+    return CSRMatrix(self.shape, indptr, indices, data)
+
+  def _mul_sparse(self, other: "CSRMatrix") -> "CSRMatrix":
+    "Algoritmo de Gustavson: combina las filas de `other` seleccionadas por cada fila de `self`"
+    indptr, indices, data = array('q', [0]), array('q'), []
+    for i in range(self.shape[0]):
+      acc: Dict[int, Any] = {}
+      for k, a in zip(*self._row(i)):
+        for j, b in zip(*other._row(k)):
+          acc[j] = acc.get(j, 0) + a * b
+      for j in sorted(acc):
+        if acc[j] != 0:
+          indices.append(j)
+          data.append(acc[j])
+      indptr.append(len(data))
+    return CSRMatrix((self.shape[0], other.shape[1]), indptr, indices, data)
+
+  def _add_dense(self, other: Matrix) -> Matrix:
+    rows = [list(row) for row in other._storage.iter_rows()]
+    for i in range(self.shape[0]):
+      out = rows[i]
+      for j, value in zip(*self._row(i)):
+        out[j] += value
+    return Matrix(rows, storage=other.storage)
+
+  def _mul_dense(self, other: Matrix) -> Matrix:
+    b_rows = list(other._storage.iter_rows())
+    cols = other.shape[1]
+    rows = []
+    for i in range(self.shape[0]):
+      out = [0] * cols
+      for k, a in zip(*self._row(i)):
+        b_row = b_rows[k]
+        for j in range(cols):
+          out[j] += a * b_row[j]
+      rows.append(out)
+    return Matrix(rows, storage=other.storage)
+
+  def _rmul_dense(self, other: Matrix) -> Matrix:
+    cols = self.shape[1]
+    sparse_rows = [self._row(k) for k in range(self.shape[0])]
+    rows = []
+    for a_row in other._storage.iter_rows():
+      out = [0] * cols
+      for k, a in enumerate(a_row):
+        if a == 0: continue
+        for j, b in zip(*sparse_rows[k]):
+          out[j] += a * b
+      rows.append(out)
+    return Matrix(rows, storage=other.storage)
+
+
+class CSCMatrix(_Compressed):
+  "Compressed Sparse Column: `indices[indptr[j]:indptr[j + 1]]` son las filas de la columna `j`"
+  format = 'csc'
+
+  def _axes(self, i, j):
+    return j, i
+
+  def tocsc(self) -> "CSCMatrix":
+    return self
+
+  def tocsr(self) -> CSRMatrix:
+    return CSRMatrix(self.shape, *self._transposed())
+
+
+FORMATS = {'coo': COOMatrix, 'csr': CSRMatrix, 'csc': CSCMatrix}
+
+def from_dense(matrix: Matrix, format: str = 'csr') -> SparseMatrix:
+  "Convierte una `Matrix` densa al formato disperso `format` (`'coo'`, `'csr'` o `'csc'`)"
+  if format not in FORMATS:
+    raise ValueError(f"Unknown sparse format '{format}'. Available: {', '.join(FORMATS)}.")
+  coo = COOMatrix(*matrix.shape)
+  for i, row in enumerate(matrix._storage.iter_rows()):
+    for j, value in enumerate(row):
+      if value != 0:
+        coo[i, j] = value
+  return getattr(coo, f"to{format}")()
+
+def auto(matrix: Union[SparseMatrix, Matrix], threshold: Optional[float] = None) -> Union[SparseMatrix, Matrix]:
+  """Elige la representación según la densidad: densa por encima de `threshold`
+  (por defecto `DENSITY_THRESHOLD`) y CSR por debajo.
+  """
+  threshold = DENSITY_THRESHOLD if threshold is None else threshold
+  if isinstance(matrix, SparseMatrix):
+    if AUTO_DENSIFY and matrix.density > threshold:
+      return matrix.to_dense()
+    return matrix
+  rows, cols = matrix.shape
+  nnz = sum(1 for row in matrix._storage.iter_rows() for value in row if value != 0)
+  if rows and cols and nnz / (rows * cols) <= threshold:
+    return from_dense(matrix)
+  return matrix
@@ -0,0 +1,538 @@
+from array import array
+from itertools import chain, repeat
+from math import hypot
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import kernels
+import parallel
+
+#region: dtypes
+# nombre del dtype -> typecode de `array`
+DTYPES: Dict[str, str] = {
+  'int8':    'b',
+  'int16':   'h',
+  'int32':   'i',
+  'int64':   'q',
+  'float32': 'f',
+  'float64': 'd',
+}
+_ORDER = list(DTYPES)
+_TYPECODES = {code: name for name, code in DTYPES.items()}
+_PYTYPES = {int: 'int64', float: 'float64'}
+
+def resolve_dtype(dtype: Any) -> Optional[str]:
+  """Normaliza un dtype a su nombre canónico (`'int64'`, `'float64'`, ...).
+  Acepta el nombre, el typecode de `array` o los tipos `int`/`float`.
+  Devuelve `None` si `dtype` no es un tipo numérico conocido.
+  """
+  if dtype is None: return None
+  if isinstance(dtype, str):
+    if dtype in DTYPES: return dtype
+    return _TYPECODES.get(dtype)
+  return _PYTYPES.get(dtype)
+
+def infer_dtype(rows: Iterable[Iterable[Any]]) -> str:
+  "dtype más simple capaz de representar todos los valores"
+  if all(isinstance(value, int) for value in chain.from_iterable(rows)):
+    return 'int64'
+  return 'float64'
+
+def pytype(dtype: str) -> Callable:
+  "Tipo de Python con el que se representan los valores de un dtype"
+  return float if dtype.startswith('float') else int
+
+def promote(a: Optional[str], b: Optional[str]) -> Optional[str]:
+  """dtype del resultado de operar valores de tipo `a` y `b`.
+  Mezclar enteros con flotantes produce `float64`.
+  """
+  if a is None or b is None: return None
+  if a == b: return a
+  if pytype(a) is not pytype(b): return 'float64'
+  return max(a, b, key=_ORDER.index)
+
+def broadcast_shape(a: Tuple[int, int], b: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+  """Forma del resultado de operar formas `a` y `b` con broadcasting (una dimensión 1
+  se repite hasta la del otro operando), o `None` si no son compatibles.
+  """
+  if any(x != y and 1 not in (x, y) for x, y in zip(a, b)):
+    return None
+  return tuple(y if x == 1 else x for x, y in zip(a, b))
+#endregion
+
+#region: Reducciones
+def _argmax(values: Sequence[Any]) -> int:
+  return max(range(len(values)), key=values.__getitem__)
+
+def _mean(values: Sequence[Any]) -> float:
+  return sum(values) / len(values)
+
+def _norm(values: Sequence[Any]) -> float:
+  return hypot(*values)
+
+# nombre -> función que reduce una fila o columna en una sola llamada (sin bucles de Python)
+REDUCTIONS: Dict[str, Callable[[Sequence[Any]], Any]] = {
+  'sum':    sum,
+  'mean':   _mean,
+  'min':    min,
+  'max':    max,
+  'argmax': _argmax,
+  'norm':   _norm,
+}
+#endregion
+
+#region: Almacenamiento
+class Storage:
+  """Interfaz común de los motores de almacenamiento de `Matrix`.
+  Cada motor guarda `rows x cols` valores y sabe construirse a partir de filas.
+  Las operaciones genéricas trabajan fila a fila; los motores pueden redefinirlas.
+  """
+  kind: str = ''
+  # los almacenamientos compartidos (vistas) se copian antes de escribir
+  shared: bool = False
+  # los de solo lectura (ficheros proyectados con `mode='r'`) también
+  readonly: bool = False
+  __slots__ = ()
+
+  rows: int
+  cols: int
+  dtype: Optional[str]
+
+  @classmethod
+  def from_rows(cls, rows: Iterable[Iterable[Any]], cols: int, dtype: Optional[str] = None) -> "Storage":
+    raise NotImplementedError
+
+  @classmethod
+  def filled(cls, rows: int, cols: int, value: Any, dtype: Optional[str] = None) -> "Storage":
+    raise NotImplementedError
+
+  @classmethod
+  def convert(cls, storage: "Storage", dtype: Optional[str] = None) -> "Storage":
+    """Construye un almacenamiento de este motor con los valores de `storage`.
+    Los motores pueden redefinirlo para compartir memoria en lugar de copiar.
+    """
+    if dtype is None and cls is not ListStorage:
+      dtype = storage.dtype or infer_dtype(storage.iter_rows())
+    return cls.from_rows(storage.iter_rows(), storage.cols, dtype)
+
+  def get(self, i: int, j: int) -> Any:
+    raise NotImplementedError
+
+  def set(self, i: int, j: int, value: Any) -> None:
+    raise NotImplementedError
+
+  def row(self, i: int) -> Sequence[Any]:
+    raise NotImplementedError
+
+  def set_row(self, i: int, values: Iterable[Any]) -> None:
+    "Sobrescribe la fila `i` (los valores se consumen antes de escribir)"
+    for j, value in enumerate(list(values)):
+      self.set(i, j, value)
+
+  def iter_rows(self) -> Iterable[Sequence[Any]]:
+    return (self.row(i) for i in range(self.rows))
+
+  def flat(self) -> Iterable[Any]:
+    "Valores en orden row-major"
+    return chain.from_iterable(self.iter_rows())
+
+  def iter_cols(self) -> Iterable[Sequence[Any]]:
+    if not self.rows:
+      return iter([()] * self.cols)
+    return zip(*self.iter_rows())
+
+  def reduce(self, name: str, axis: Optional[int] = None) -> Any:
+    """Reducción `name` (ver `REDUCTIONS`) de todos los valores (`axis=None`), de cada
+    columna (`axis=0`, una lista) o de cada fila (`axis=1`, una lista).
+    Con `axis=None`, `argmax` devuelve la posición `(i, j)` y `norm` la norma de Frobenius.
+    """
+    func = REDUCTIONS[name]
+    if axis == 0:
+      return list(map(func, self.iter_cols()))
+    if axis == 1:
+      return list(map(func, self.iter_rows()))
+    if name == 'argmax':
+      i = _argmax(list(map(max, self.iter_rows())))
+      return i, _argmax(self.row(i))
+    if name == 'mean':
+      return self.reduce('sum') / (self.rows * self.cols)
+    # la reducción de las reducciones de cada fila (la norma de las normas es la de Frobenius)
+    return func(list(map(func, self.iter_rows())))
+
+  def iter_values(self) -> Iterator[Any]:
+    "Iterador de valores de Python en orden row-major"
+    return iter(self.flat())
+
+  def iter_row_lists(self) -> Iterator[List[Any]]:
+    "Iterador de copias de cada fila como lista"
+    return map(list, self.iter_rows())
+
+  def to_lists(self) -> List[List[Any]]:
+    return [list(row) for row in self.iter_rows()]
+
+  def copy(self) -> "Storage":
+    return self.from_rows(self.iter_rows(), self.cols, self.dtype)
+
+  def astype(self, dtype: str) -> "Storage":
+    raise NotImplementedError
+
+  @property
+  def backend(self) -> type:
+    "Motor con el que se construyen los resultados de operar este almacenamiento"
+    return type(self)
+
+  def materialize(self) -> "Storage":
+    "Almacenamiento propio con los mismos valores (solo copia si es compartido)"
+    return self
+
+  def elementwise(self, op: Callable[[Any, Any], Any], other: Any, dtype: Optional[str]) -> "Storage":
+    """Aplica `op` (p. ej. `operator.add`) elemento a elemento con otro almacenamiento
+    del mismo tamaño o con un escalar, devolviendo un almacenamiento nuevo.
+    """
+    if isinstance(other, Storage):
+      rows = (list(map(op, a, b)) for a, b in zip(self.iter_rows(), other.iter_rows()))
+    else:
+      rows = (list(map(op, a, repeat(other))) for a in self.iter_rows())
+    return self.from_rows(rows, self.cols, dtype)
+
+  def ielementwise(self, op: Callable[[Any, Any], Any], other: Any) -> None:
+    "Como `elementwise` pero escribe el resultado en este almacenamiento"
+    for i in range(self.rows):
+      b = other.row(i) if isinstance(other, Storage) else repeat(other)
+      for j, value in enumerate(map(op, self.row(i), b)):
+        self.set(i, j, value)
+
+  def matmul(self, other: "Storage", dtype: Optional[str], workers: Optional[int] = None,
+             min_parallel_size: Optional[int] = None, **options) -> "Storage":
+    """Producto matricial; `options` se pasan a `kernels.matmul`.
+    Con `workers > 1` y operandos grandes las filas se reparten entre procesos (`parallel.matmul`).
+    Solo si los dos operandos tienen dtype: sin él (`'list'` sin tipo) pueden mezclar enteros y
+    floats o tener enteros grandes que no caben en un `array`, y se usa el kernel en serie.
+    """
+    typed = self.dtype is not None and other.dtype is not None
+    if typed and parallel.use_parallel(self.rows, self.cols, other.cols, workers, min_parallel_size):
+      a, b = self.to_array(), other.to_array()
+      out_dtype = dtype or promote(_TYPECODES[a.typecode], _TYPECODES[b.typecode])
+      buf = parallel.matmul(a, b, self.rows, self.cols, other.cols, DTYPES[out_dtype], workers, options.get('block_size'))
+      return self.from_buffer(buf, self.rows, other.cols, dtype)
+    result = kernels.matmul(list(self.iter_rows()), list(other.iter_rows()), other.cols, **options)
+    return self.from_rows(result, other.cols, dtype)
+
+  def to_array(self) -> array:
+    "Valores en un `array` plano (row-major) del dtype del almacenamiento"
+    dtype = self.dtype or infer_dtype(self.iter_rows())
+    return array(DTYPES[dtype], self.flat())
+
+  @classmethod
+  def from_buffer(cls, buf: array, rows: int, cols: int, dtype: Optional[str]) -> "Storage":
+    "Construye el almacenamiento a partir de un `array` plano en orden row-major"
+    return cls.from_rows((buf[i * cols:(i + 1) * cols] for i in range(rows)), cols, dtype)
+
+class ListStorage(Storage):
+  """Almacenamiento original: una lista de Python por fila.
+  Admite valores de cualquier tipo; `dtype` es opcional.
+  """
+  kind = 'list'
+  __slots__ = ('data', 'rows', 'cols', 'dtype')
+
+  def __init__(self, data: List[List[Any]], dtype: Optional[str] = None) -> None:
+    self.data = data
+    self.rows = len(data)
+    self.cols = len(data[0]) if data else 0
+    self.dtype = dtype
+
+  @classmethod
+  def from_rows(cls, rows, cols, dtype=None):
+    if dtype is None:
+      return cls([list(row) for row in rows])
+    _type = pytype(dtype)
+    return cls([list(map(_type, row)) for row in rows], dtype)
+
+  @classmethod
+  def filled(cls, rows, cols, value, dtype=None):
+    if dtype is not None: value = pytype(dtype)(value)
+    return cls([[value] * cols for _ in range(rows)], dtype)
+
+  def get(self, i, j):
+    return self.data[i][j]
+
+  def set(self, i, j, value):
+    self.data[i][j] = value
+
+  def row(self, i):
+    return self.data[i]
+
+  def set_row(self, i, values):
+    self.data[i][:] = values
+
+  def iter_rows(self):
+    return iter(self.data)
+
+  def to_lists(self):
+    return self.data
+
+  @classmethod
+  def convert(cls, storage, dtype=None):
+    return cls.from_rows(storage.to_lists(), storage.cols, dtype)
+
+  def ielementwise(self, op, other):
+    if isinstance(other, Storage):
+      for row, b in zip(self.data, other.iter_rows()):
+        row[:] = map(op, row, b)
+    else:
+      for row in self.data:
+        row[:] = map(op, row, repeat(other))
+
+  def astype(self, dtype):
+    return self.from_rows(self.data, self.cols, dtype)
+
+
+class ArrayStorage(Storage):
+  """Almacenamiento contiguo: un único `array.array` tipado en orden row-major.
+  El elemento `(i, j)` está en `buf[i * strides[0] + j * strides[1]]`.
+  """
+  kind = 'array'
+  __slots__ = ('buf', 'rows', 'cols', 'dtype')
+
+  def __init__(self, buf: array, rows: int, cols: int, dtype: str) -> None:
+    if len(buf) != rows * cols:
+      raise ValueError(f"Buffer of size {len(buf)} does not match shape ({rows}, {cols}).")
+    self.buf = buf
+    self.rows = rows
+    self.cols = cols
+    self.dtype = dtype
+
+  @property
+  def strides(self):
+    return (self.cols, 1)
+
+  @property
+  def typecode(self) -> str:
+    return DTYPES[self.dtype]
+
+  @classmethod
+  def from_flat(cls, values: Iterable[Any], rows: int, cols: int, dtype: Optional[str]) -> "ArrayStorage":
+    dtype = dtype or 'float64'
+    return cls(array(DTYPES[dtype], values), rows, cols, dtype)
+
+  @classmethod
+  def from_rows(cls, rows, cols, dtype=None):
+    buf = array(DTYPES[dtype or 'float64'], chain.from_iterable(rows))
+    return cls(buf, len(buf) // cols if cols else 0, cols, dtype or 'float64')
+
+  @classmethod
+  def filled(cls, rows, cols, value, dtype=None):
+    dtype = dtype or 'float64'
+    return cls(array(DTYPES[dtype], [pytype(dtype)(value)]) * (rows * cols), rows, cols, dtype)
+
+  def get(self, i, j):
+    if not (-self.rows <= i < self.rows and -self.cols <= j < self.cols):
+      raise IndexError("Matrix index out of range.")
+    return self.buf[(i % self.rows) * self.cols + j % self.cols]
+
+  def set(self, i, j, value):
+    if not (-self.rows <= i < self.rows and -self.cols <= j < self.cols):
+      raise IndexError("Matrix index out of range.")
+    self.buf[(i % self.rows) * self.cols + j % self.cols] = value
+
+  def row(self, i):
+    start = i * self.cols
+    return self.buf[start:start + self.cols]
+
+  def set_row(self, i, values):
+    start = i * self.cols
+    self.buf[start:start + self.cols] = array(self.typecode, values)
+
+  def flat(self):
+    return self.buf
+
+  def iter_cols(self):
+    return (self.buf[j::self.cols] for j in range(self.cols))
+
+  def reduce(self, name, axis=None):
+    if axis is None and name in ('sum', 'min', 'max', 'norm'):
+      return REDUCTIONS[name](self.buf)
+    return super().reduce(name, axis)
+
+  def to_array(self):
+    return self.buf
+
+  @classmethod
+  def from_buffer(cls, buf, rows, cols, dtype):
+    dtype = dtype or _TYPECODES[buf.typecode]
+    if DTYPES[dtype] != buf.typecode:
+      buf = array(DTYPES[dtype], buf)
+    return cls(buf, rows, cols, dtype)
+
+  def copy(self):
+    return ArrayStorage(array(self.typecode, self.buf), self.rows, self.cols, self.dtype)
+
+  def astype(self, dtype):
+    values = self.buf
+    # `array` no convierte flotantes a enteros implícitamente
+    if pytype(dtype) is int and pytype(self.dtype) is float:
+      values = map(int, values)
+    return ArrayStorage(array(DTYPES[dtype], values), self.rows, self.cols, dtype)
+
+  def elementwise(self, op, other, dtype):
+    b = other.flat() if isinstance(other, Storage) else repeat(other)
+    return self.from_flat(map(op, self.buf, b), self.rows, self.cols, dtype)
+
+  def ielementwise(self, op, other):
+    b = other.flat() if isinstance(other, Storage) else repeat(other)
+    self.buf[:] = array(self.typecode, map(op, self.buf, b))
+#endregion
+
+#region: Vistas
+def _as_slice(indices: range) -> slice:
+  "`slice` equivalente a un `range` (un `stop` negativo significa 'hasta el principio')"
+  stop = indices.stop if indices.stop >= 0 else None
+  return slice(indices.start, stop, indices.step)
+
+class ViewStorage(Storage):
+  """Vista sobre otro almacenamiento: un subconjunto de filas y columnas (con paso)
+  y, opcionalmente, traspuesto. No copia valores; `Matrix` la materializa
+  (copy-on-write) la primera vez que se escribe en ella, por lo que las escrituras
+  en la vista nunca afectan al original. Mientras no se escriba, la vista refleja
+  los cambios del original.
+  """
+  kind = 'view'
+  shared = True
+  __slots__ = ('base', 'row_idx', 'col_idx', 'transposed')
+
+  def __init__(self, base: Storage, row_idx: range, col_idx: range, transposed: bool = False) -> None:
+    self.base = base
+    self.row_idx = row_idx
+    self.col_idx = col_idx
+    self.transposed = transposed
+
+  @classmethod
+  def of(cls, storage: Storage, rows: slice = slice(None), cols: slice = slice(None), transposed: bool = False) -> "ViewStorage":
+    "Vista de `storage` (que puede ser a su vez una vista); `rows` y `cols` son relativos a ella"
+    if isinstance(storage, ViewStorage):
+      row_idx, col_idx = storage.row_idx, storage.col_idx
+      if storage.transposed:
+        rows, cols = cols, rows
+      return cls(storage.base, row_idx[rows], col_idx[cols], storage.transposed != transposed)
+    return cls(storage, range(storage.rows)[rows], range(storage.cols)[cols], transposed)
+
+  @property
+  def rows(self):
+    return len(self.col_idx if self.transposed else self.row_idx)
+
+  @property
+  def cols(self):
+    return len(self.row_idx if self.transposed else self.col_idx)
+
+  @property
+  def dtype(self):
+    return self.base.dtype
+
+  @property
+  def backend(self):
+    return self.base.backend
+
+  def get(self, i, j):
+    if self.transposed: i, j = j, i
+    return self.base.get(self.row_idx[i], self.col_idx[j])
+
+  def set(self, i, j, value):
+    raise TypeError("Views are read-only; Matrix copies them before writing.")
+
+  def _base_rows(self) -> Iterable[Sequence[Any]]:
+    cols = _as_slice(self.col_idx)
+    return (self.base.row(r)[cols] for r in self.row_idx)
+
+  def row(self, i):
+    if self.transposed:
+      c = self.col_idx[i]
+      return [self.base.get(r, c) for r in self.row_idx]
+    return self.base.row(self.row_idx[i])[_as_slice(self.col_idx)]
+
+  def iter_rows(self):
+    if self.transposed:
+      return zip(*self._base_rows()) if self.row_idx else iter([[]] * self.rows)
+    return self._base_rows()
+
+  def to_lists(self):
+    return self.materialize().to_lists()
+
+  def materialize(self):
+    return self.backend.from_rows(self.iter_rows(), self.cols, self.dtype)
+
+  def copy(self):
+    return self.materialize()
+
+  def astype(self, dtype):
+    return self.materialize().astype(dtype)
+
+
+class BroadcastStorage(Storage):
+  """Almacenamiento de una fila o una columna repetido hasta `rows x cols` (broadcasting).
+  No copia valores: al leer se repite la misma fila, o el valor de cada fila.
+  """
+  kind = 'broadcast'
+  shared = True
+  __slots__ = ('base', 'rows', 'cols')
+
+  def __init__(self, base: Storage, rows: int, cols: int) -> None:
+    self.base = base
+    self.rows = rows
+    self.cols = cols
+
+  @property
+  def dtype(self):
+    return self.base.dtype
+
+  @property
+  def backend(self):
+    return self.base.backend
+
+  def get(self, i, j):
+    return self.base.get(i if self.base.rows != 1 else 0, j if self.base.cols != 1 else 0)
+
+  def set(self, i, j, value):
+    raise TypeError("Broadcast storages are read-only.")
+
+  def row(self, i):
+    row = self.base.row(i if self.base.rows != 1 else 0)
+    if self.base.cols == 1 and self.cols != 1:
+      return [row[0]] * self.cols
+    return row
+
+  def iter_rows(self):
+    if self.base.rows == 1:
+      return repeat(self.row(0), self.rows)
+    return super().iter_rows()
+
+  def materialize(self):
+    return self.backend.from_rows(self.iter_rows(), self.cols, self.dtype)
+
+  def copy(self):
+    return self.materialize()
+
+  def astype(self, dtype):
+    return self.materialize().astype(dtype)
+#endregion
+
+#region: Registro de motores
+BACKENDS: Dict[str, type] = {
+  ListStorage.kind:  ListStorage,
+  ArrayStorage.kind: ArrayStorage,
+}
+
+def register_backend(cls: type) -> type:
+  """Registra un motor de almacenamiento bajo `cls.kind`.
+  Puede usarse como decorador de clase.
+  """
+  BACKENDS[cls.kind] = cls
+  return cls
+
+def available_backends() -> List[str]:
+  return list(BACKENDS)
+
+def get_backend(name: str) -> type:
+  try:
+    return BACKENDS[name]
+  except KeyError:
+    raise ValueError(f"Unknown storage backend '{name}'. Available: {', '.join(BACKENDS)}.")
+#endregion